@@ -1,14 +1,51 @@
+from dataclasses import dataclass
 from typing import Tuple
 
 import numpy as np
 import numpy.typing as npt
-from pde_calculations.flow import Flow
+from pde_calculations.flow_table import FlowTable
 from pde_calculations.sim_enums import SimType
 from pde_calculations.simulations import calc_mix_power, power_to_energy
 
 from pde_calculations.medium import Medium
 
 
+@dataclass
+class AggregationReport:
+    max_temp_deviation: float  # [K] largest deviation of any layer and time step
+    mean_temp_deviation: float  # [K] mean absolute deviation over all layers and steps
+    max_outlet_temp_deviation: float  # [K] largest deviation of the bottom layer
+
+
+def get_aggregation_report(
+    reference_state: npt.NDArray[np.float64],
+    aggregated_state: npt.NDArray[np.float64],
+) -> AggregationReport:
+    """
+    Compares the vessel states of a simulation on the aggregated flows (see
+    FlowTable.aggregated) with the simulation on the separate flows.
+
+    Parameters
+    ----------
+    reference_state: npt.NDArray[np.float64]
+        Vessel state of the simulation on the separate flows.
+    aggregated_state: npt.NDArray[np.float64]
+        Vessel state of the same simulation on the aggregated flows.
+
+    Returns
+    -------
+    AggregationReport
+        Deviations of the inner layer temperatures in K.
+    """
+
+    deviation = np.abs(aggregated_state[1:-1] - reference_state[1:-1])
+    return AggregationReport(
+        max_temp_deviation=float(np.max(deviation)),
+        mean_temp_deviation=float(np.mean(deviation)),
+        max_outlet_temp_deviation=float(np.max(deviation[-1])),
+    )
+
+
 def get_energy_consumption_data(
     power_cons: npt.NDArray[np.float64], delta_t: float
 ) -> Tuple[npt.NDArray[np.float64], float]:
@@ -29,35 +66,46 @@ def get_energy_consumption_data(
         float: total energy summed
     """
 
-    energy_cons_cum = np.apply_along_axis(
-        lambda power: power_to_energy(power, delta_t), 0, power_cons  # type: ignore
-    )
-    total_energy = np.sum(energy_cons_cum)  # type: ignore
-    energy_cons_cum = np.cumsum(energy_cons_cum)
+    energy_cons = power_to_energy(power_cons, delta_t)
+    total_energy = float(np.sum(energy_cons))
+    energy_cons_cum = np.cumsum(energy_cons)
     return energy_cons_cum, total_energy
 
 
 def get_in_out_energy_cons(
-    flows: list[Flow], vessel_state: npt.NDArray[np.float64]
+    flows: FlowTable, vessel_state: npt.NDArray[np.float64], delta_t: float
 ) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
     """
-    Calculates the energy consumption of all input flows for the source and sink side.
+    Calculates the energy consumption of all input flows for the source and sink side,
+    summed over the flows of each side for every timestep.
     """
 
-    source_energy = np.zeros(flows[0].flow_temp.shape)
-    sink_energy = np.zeros(source_energy.shape)
-    for flow in flows:
-        if flow.input_type == SimType.SOURCE:
-            source_energy += calc_flow_energy(
-                flow=flow, output_temp=vessel_state[-2, 1:]
-            )
-        else:
-            sink_energy += calc_flow_energy(flow=flow, output_temp=vessel_state[1, 1:])
-    return source_energy, sink_energy
+    source_energy = calc_flow_energy(
+        flow_temp=flows.flow_temps[flows.is_source],
+        mass_flow=flows.mass_flows_kg_s[flows.is_source],
+        input_type=SimType.SOURCE,
+        c_p=flows.medium.c_p,
+        output_temp=vessel_state[-2, 1:],
+        delta_t=delta_t,
+    )
+    sink_energy = calc_flow_energy(
+        flow_temp=flows.flow_temps[~flows.is_source],
+        mass_flow=flows.mass_flows_kg_s[~flows.is_source],
+        input_type=SimType.SINK,
+        c_p=flows.medium.c_p,
+        output_temp=vessel_state[1, 1:],
+        delta_t=delta_t,
+    )
+    return source_energy.sum(axis=0), sink_energy.sum(axis=0)
 
 
 def calc_flow_energy(
-    flow: Flow, output_temp: npt.NDArray[np.float64]
+    flow_temp: npt.NDArray[np.float64],
+    mass_flow: npt.NDArray[np.float64],
+    input_type: SimType,
+    c_p: float,
+    output_temp: npt.NDArray[np.float64],
+    delta_t: float,
 ) -> npt.NDArray[np.float64]:
     """
     Calculates the energy consumed on either the source or sink side to achieve the temperature
@@ -72,66 +120,69 @@ def calc_flow_energy(
 
     Parameters
     ----------
-    flow: Flow
-        Flow with the given input temperature and the mass flow.
+    flow_temp: npt.NDArray[np.float64]
+        Given input temperature of the flow, or of the shape (number_of_flows,
+        number_of_sim_steps) for several flows of the same side.
+    mass_flow: npt.NDArray[np.float64]
+        Mass flow of the flow in kg/s, same shape as flow_temp.
+    input_type: SimType
+        Whether the flow enters on the source or sink side.
+    c_p: float
+        Specific heat capacity of the medium.
     output_temp: npt.NDArray[np.float64]
         Temperature of the calcualted output flow.
+    delta_t: float
+        Length of each timestep in seconds.
 
     Returns
     -------
     npt.NDArray[np.float64]
-        Array of the shape (number_of_sim_steps, 1) which gives the consumed energy for every
+        Array of the shape of flow_temp which gives the consumed energy for every
         timestep corresponding to the given flow.
     """
 
-    flow_power = np.zeros(output_temp.shape)
-    if flow.input_type == SimType.SOURCE:
-        for timestep, temp in enumerate(output_temp):
-            flow_power[timestep] = calc_mix_power(
-                mass_flow=flow.mass_flow_kg_s[timestep],
-                c_p_fluid=flow.medium.c_p,
-                high_temp=flow.flow_temp[timestep],
-                low_temp=temp,
-            )
+    if input_type == SimType.SOURCE:
+        flow_power = calc_mix_power(
+            mass_flow=mass_flow,
+            c_p_fluid=c_p,
+            high_temp=flow_temp,
+            low_temp=output_temp,
+        )
     else:
-        for timestep, temp in enumerate(output_temp):
-            flow_power[timestep] = calc_mix_power(
-                mass_flow=flow.mass_flow_kg_s[timestep],
-                c_p_fluid=flow.medium.c_p,
-                high_temp=temp,
-                low_temp=flow.flow_temp[timestep],
-            )
-    flow_energy = np.apply_along_axis(
-        lambda power: power_to_energy(power=power, delta_t=300), 0, flow_power  # type: ignore
-    )
-    return flow_energy
+        flow_power = calc_mix_power(
+            mass_flow=mass_flow,
+            c_p_fluid=c_p,
+            high_temp=output_temp,
+            low_temp=flow_temp,
+        )
+    return power_to_energy(power=flow_power, delta_t=delta_t)
 
 
 def get_outer_power_cons(
-    flows: list[Flow], medium: Medium, simulation_result: npt.NDArray[np.float64]
+    flows: FlowTable, medium: Medium, simulation_result: npt.NDArray[np.float64]
 ) -> Tuple[list[npt.NDArray[np.float64]], list[npt.NDArray[np.float64]]]:
-    source_power: list[npt.NDArray[np.float64]] = []
-    sink_power: list[npt.NDArray[np.float64]] = []
-    for flow in flows:
-        if flow.input_type == SimType.SOURCE:
-            source_power.append(
-                get_source_power(
-                    high_temp=flow.flow_temp,
-                    low_temp=simulation_result[-2, :],
-                    mass_flow=flow.mass_flow_kg_s,
-                    c_p=medium.c_p,
-                ).reshape((len(flow.flow_temp), 1))
-            )
-        else:
-            sink_power.append(
-                get_source_power(
-                    high_temp=simulation_result[1, :],
-                    low_temp=flow.flow_temp,
-                    mass_flow=flow.mass_flow_kg_s,
-                    c_p=medium.c_p,
-                ).reshape((len(flow.flow_temp), 1))
-            )
-    return source_power, sink_power
+    """
+    Power of every source and sink flow, each of the shape (number_of_steps, 1), taken
+    against the vessel state at the start of each timestep.
+    """
+
+    steps = flows.number_of_steps
+    source_power = get_source_power(
+        high_temp=flows.flow_temps[flows.is_source],
+        low_temp=simulation_result[-2, :steps],
+        mass_flow=flows.mass_flows_kg_s[flows.is_source],
+        c_p=medium.c_p,
+    )
+    sink_power = get_source_power(
+        high_temp=simulation_result[1, :steps],
+        low_temp=flows.flow_temps[~flows.is_source],
+        mass_flow=flows.mass_flows_kg_s[~flows.is_source],
+        c_p=medium.c_p,
+    )
+    return (
+        [power.reshape((steps, 1)) for power in source_power],
+        [power.reshape((steps, 1)) for power in sink_power],
+    )
 
 
 def get_source_power(
@@ -140,11 +191,6 @@ def get_source_power(
     mass_flow: npt.NDArray[np.float64],
     c_p: float,
 ) -> npt.NDArray[np.float64]:
-    return np.array(
-        [
-            calc_mix_power(
-                mass_flow=inp[0], high_temp=inp[1], low_temp=inp[2], c_p_fluid=c_p
-            )
-            for inp in list(zip(mass_flow, high_temp, low_temp))
-        ]
+    return calc_mix_power(
+        mass_flow=mass_flow, high_temp=high_temp, low_temp=low_temp, c_p_fluid=c_p
     )
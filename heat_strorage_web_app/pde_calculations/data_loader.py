@@ -1,9 +1,13 @@
 from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Callable
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
-from sim_enums import SimType
+from pde_calculations.flow_table import FlowTable
+from pde_calculations.medium import Medium
+from pde_calculations.sim_enums import SimType
 
 
 def cal_mix_temp(
@@ -16,12 +20,131 @@ def cal_mix_temp(
     return t_mix
 
 
+# path or open binary file (e.g. an upload) of the flow data
+FlowDataSource = str | Path | BinaryIO
+
+
+def read_excel_data(
+    source: FlowDataSource, sheet_name: str | int = 0
+) -> npt.NDArray[np.float64]:
+    return pd.read_excel(  # type: ignore
+        source, sheet_name=sheet_name, skiprows=1, header=None, dtype=np.float64
+    ).to_numpy(dtype=np.float64)
+
+
+def read_csv_data(source: FlowDataSource) -> npt.NDArray[np.float64]:
+    return pd.read_csv(  # type: ignore
+        source, skiprows=1, header=None, dtype=np.float64
+    ).to_numpy(dtype=np.float64)
+
+
+def read_parquet_data(source: FlowDataSource) -> npt.NDArray[np.float64]:
+    return pd.read_parquet(source).to_numpy(dtype=np.float64)
+
+
+def read_numpy_data(source: FlowDataSource) -> npt.NDArray[np.float64]:
+    data = np.load(source)
+    if data.ndim != 2:
+        raise ValueError(
+            f"Flow data has to be a 2D array (time steps, columns), got {data.ndim}D."
+        )
+    return data.astype(np.float64, copy=False)
+
+
+def open_numpy_data(path: str | Path) -> npt.NDArray[np.float64]:
+    """
+    Memory map of the flow data of a .npy file, the data is read from the file on
+    access instead of being loaded up front. The map is read-only and its pages are
+    shared by every process mapping the same file.
+    """
+
+    data = np.load(path, mmap_mode="r")
+    if data.ndim != 2 or data.dtype != np.float64:
+        raise ValueError(
+            "Memory-mapped flow data has to be a 2D float64 array (time steps, "
+            f"columns), got a {data.ndim}D {data.dtype} array."
+        )
+    return data
+
+
+def is_same_view(
+    array: npt.NDArray[np.float64], other: npt.NDArray[np.float64]
+) -> bool:
+    """
+    True if both arrays view the same memory with the same layout.
+    """
+
+    return (
+        array.__array_interface__["data"][0] == other.__array_interface__["data"][0]
+        and array.shape == other.shape
+        and array.strides == other.strides
+    )
+
+
+FLOW_DATA_READERS: dict[str, Callable[[FlowDataSource], npt.NDArray[np.float64]]] = {
+    ".xlsx": read_excel_data,
+    ".csv": read_csv_data,
+    ".parquet": read_parquet_data,
+    ".npy": read_numpy_data,
+}
+
+
+def read_flow_data(
+    source: FlowDataSource,
+    file_name: str,
+    sheet_name: str | int = 0,
+    memory_map: bool = False,
+) -> npt.NDArray[np.float64]:
+    """
+    Reads the flow data of a file with the reader of its extension. Every format holds
+    one row per time step with the columns "Temperatur i" followed by "Volumenstrom i".
+    Excel and CSV files start with a header row, which is skipped, Parquet files carry
+    their column names separately and .npy files hold the bare (time steps, columns)
+    array. The sheet name is only used for Excel files.
+
+    Parameters
+    ----------
+    source: FlowDataSource
+        Path or open binary file.
+    file_name: str
+        Name of the file, only its extension is used to choose the reader.
+    sheet_name: str | int
+        Name or index of the Excel sheet.
+    memory_map: bool
+        Maps the file instead of reading it, see open_numpy_data. Only possible for
+        .npy files given by their path.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        Array of the shape (number_of_steps, number_of_columns).
+    """
+
+    extension = Path(file_name).suffix.lower()
+    if extension not in FLOW_DATA_READERS:
+        raise ValueError(
+            f"Unsupported file type {extension!r}, expected one of "
+            f"{', '.join(FLOW_DATA_READERS)}."
+        )
+    if memory_map:
+        if extension != ".npy" or not isinstance(source, (str, Path)):
+            raise ValueError(
+                "Only .npy files given by their path can be memory-mapped."
+            )
+        return open_numpy_data(source)
+    if extension == ".xlsx":
+        return read_excel_data(source, sheet_name)
+    return FLOW_DATA_READERS[extension](source)
+
+
 @dataclass
 class RawDataLoader:
     path: str
     sheet_name: str
     sim_type: SimType
+    memory_map: bool = False  # map a .npy file instead of loading it
     number_of_inputs: int = field(init=False)
+    flow_data: npt.NDArray[np.float64] = field(init=False)  # (steps, columns)
     data: pd.DataFrame = field(init=False)
     temperatures: list[npt.NDArray[np.float64]] = field(init=False)
     masses: list[npt.NDArray[np.float64]] = field(init=False)
@@ -29,7 +152,7 @@ class RawDataLoader:
     initial_mass: list[npt.NDArray[np.float64]] = field(init=False)
 
     def __post_init__(self):
-        self.read_xlsx_to_pd()
+        self.read_data_to_pd()
         self.number_of_inputs = int(self.get_number_of_columns() / 2)
         self.data.rename(columns=self.generate_header(), inplace=True)
         self.df_to_numpy()
@@ -47,21 +170,38 @@ class RawDataLoader:
         }
         return rename_dict
 
-    def read_xlsx_to_pd(self) -> None:
-        self.data = pd.read_excel(self.path, sheet_name=self.sheet_name)  # type: ignore
+    def read_data_to_pd(self) -> None:
+        self.flow_data = read_flow_data(
+            self.path, self.path, sheet_name=self.sheet_name, memory_map=self.memory_map
+        )
+        self.data = pd.DataFrame(self.flow_data, copy=False)
 
     def get_number_of_columns(self) -> int:
         return len(self.data.columns)
 
     def df_to_numpy(self) -> None:
-        self.temperatures = [
-            self.data[f"temperature_{i}"].to_numpy()  # type: ignore
-            for i in range(self.number_of_inputs)
-        ]
+        # views of the columns, a memory-mapped file stays unloaded
+        self.temperatures = [self.flow_data[:, i] for i in range(self.number_of_inputs)]
         self.masses = [
-            self.data[f"mass_{i}"].to_numpy() for i in range(self.number_of_inputs)  # type: ignore
+            self.flow_data[:, self.number_of_inputs + i]
+            for i in range(self.number_of_inputs)
         ]
 
+    def holds_file_columns(self) -> bool:
+        """
+        True if the inputs are still the columns of the file, i.e. none was combined
+        or replaced.
+        """
+
+        number_of_inputs = self.flow_data.shape[1] // 2
+        if self.number_of_inputs != number_of_inputs:
+            return False
+        return all(
+            is_same_view(temperature, self.flow_data[:, i])
+            and is_same_view(mass, self.flow_data[:, number_of_inputs + i])
+            for i, (temperature, mass) in enumerate(zip(self.temperatures, self.masses))
+        )
+
     def combine_inputs(
         self, index: list[int]
     ) -> None:  # TODO: index 2 must be bigger than index 1
@@ -84,3 +224,19 @@ class RawDataLoader:
 
     def get_single_data(self, index: int) -> npt.NDArray[np.float64]:
         return np.vstack((self.temperatures[index], self.masses[index]))  # type: ignore
+
+    def to_flow_table(self, medium: Medium) -> FlowTable:
+        """
+        Table of all (possibly combined) inputs as flows of the loader's SimType. As
+        long as the inputs are the columns of the file, the table views the file data
+        instead of copying it, so a memory-mapped file is only read while simulating.
+        """
+
+        if self.holds_file_columns():
+            return FlowTable.from_data(self.flow_data, self.sim_type, medium)
+        return FlowTable(
+            flow_temps=np.array(self.temperatures, dtype=np.float64),
+            volume_flows=np.array(self.masses, dtype=np.float64),
+            is_source=np.full(self.number_of_inputs, self.sim_type == SimType.SOURCE),
+            medium=medium,
+        )
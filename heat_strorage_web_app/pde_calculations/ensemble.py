@@ -0,0 +1,396 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+from pde_calculations.environment import Environment
+from pde_calculations.flow import volume_to_mass_flow
+from pde_calculations.flow_table import FlowTable
+from pde_calculations.heat_pde import HeatTransferEquation
+from pde_calculations.medium import Medium
+from pde_calculations.sim_enums import SimType, SolverType
+from pde_calculations.simulations import (
+    VESSEL_STATE_UPDATES,
+    HeaterSettings,
+    calc_cooler_power,
+    calc_mix_power,
+    calc_substep_counts,
+)
+from pde_calculations.vessel import Vessel
+
+
+@dataclass
+class EnsembleResult:
+    vessel_state: npt.NDArray[np.float64]  # (segmentation + 2, steps + 1, variants)
+    heater_power: npt.NDArray[np.float64]  # (steps, variants) [kW]
+    cooler_power: npt.NDArray[np.float64]  # (steps, variants) [kW]
+    heater_on: npt.NDArray[np.bool_]  # (steps, variants) heater state of each step
+
+
+def stack_heat_transfer_equations(
+    htes: list[HeatTransferEquation],
+) -> HeatTransferEquation:
+    """
+    Combines the heat transfer equations of several variants into one equation whose
+    Medium, Vessel and Environment hold arrays with one entry per variant instead of
+    scalars. Its CoefficientPlan then holds one coefficient per variant and advances
+    every variant at once on vessel states of the shape (segmentation + 2,
+    number_of_variants).
+
+    All variants need the same segmentation, since their layers are advanced together.
+    """
+
+    segmentations = {hte.vessel.segmentation for hte in htes}
+    if len(segmentations) != 1:
+        raise ValueError(
+            f"All variants need the same segmentation, got {sorted(segmentations)}."
+        )
+    vessel = Vessel(
+        height=np.array([hte.vessel.height for hte in htes]),  # type: ignore
+        radius=np.array([hte.vessel.radius for hte in htes]),  # type: ignore
+        segmentation=segmentations.pop(),
+        theta=np.array([hte.vessel.theta for hte in htes]),  # type: ignore
+    )
+    vessel.init_state = np.hstack([hte.vessel.init_state for hte in htes])
+    fluid = Medium(
+        density=np.array([hte.fluid.density for hte in htes]),  # type: ignore
+        alpha=np.array([hte.fluid.alpha for hte in htes]),  # type: ignore
+        c_p=np.array([hte.fluid.c_p for hte in htes]),  # type: ignore
+    )
+    env = Environment(
+        env_temp=np.array([hte.env.env_temp for hte in htes])  # type: ignore
+    )
+    return HeatTransferEquation(fluid=fluid, vessel=vessel, env=env)
+
+
+def get_average_section_temps(
+    current_vessel_state: npt.NDArray[np.float64], vessel_section: float
+) -> npt.NDArray[np.float64]:
+    """
+    Average temperature of the upper vessel section of every variant (column), see
+    simulations.get_average_section_temp.
+    """
+
+    number_of_segments = int((len(current_vessel_state) - 2) * vessel_section) + 2
+    return np.mean(current_vessel_state[1:number_of_segments], axis=0)
+
+
+def temp_hysteresis_vector(
+    critical_temp: float | npt.NDArray[np.float64],
+    high_temp: float | npt.NDArray[np.float64],
+    average_section_temp: npt.NDArray[np.float64],
+    heater_on_currently: npt.NDArray[np.bool_],
+) -> npt.NDArray[np.bool_]:
+    """
+    Elementwise version of simulations.temp_hysteresis for the heater state of every
+    variant.
+    """
+
+    return (average_section_temp <= critical_temp) | (
+        (average_section_temp < high_temp) & heater_on_currently
+    )
+
+
+def ensemble_simulation(
+    htes: list[HeatTransferEquation],
+    flows: FlowTable,
+    delta_t: int,
+    heater: HeaterSettings | None = None,
+    cooler_temp: float | npt.NDArray[np.float64] | None = None,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    out: npt.NDArray[np.float64] | None = None,
+    resume_from: EnsembleResult | None = None,
+    resume_timestep: int = 0,
+) -> EnsembleResult:
+    """
+    Simulates several parameter variants over the same input flows in one pass. The
+    variants may differ in vessel height and radius, Medium, environment temperature
+    and heater thresholds. Every time step all variants are advanced together as one
+    array of shape (segmentation + 2, number_of_variants).
+
+    After the flows changed from some time step on (see
+    flow_table.get_first_changed_step), the result of the previous run up to that time
+    step still holds. The run can resume from it and only recompute the remaining time
+    steps.
+
+    Parameters
+    ----------
+    htes: list[HeatTransferEquation]
+        The heat transfer equation of every variant.
+    flows: FlowTable
+        Table of all the flows that shall be simulated, shared by all variants. The
+        mass flow of each variant is derived from its own density.
+    delta_t: int
+        Time discretization delta between each time step.
+    heater: HeaterSettings | None
+        Heater thresholds, without settings the pure heat equation is simulated.
+    cooler_temp: float | npt.NDArray[np.float64] | None
+        Temperature the bottom layer outflow is cooled to, the cooler power is
+        accumulated alongside the simulation (see simulations.calc_cooler_power).
+    solver: SolverType
+        Explicit update or implicit theta scheme used to advance the vessel states.
+    sub_stepping: bool
+        Divides time steps which exceed the stability limit of the explicit update into
+        sub steps. Every variant takes its own number of sub steps, so its result does
+        not depend on the other variants of the ensemble.
+    out: npt.NDArray[np.float64] | None
+        Optional buffer of shape (segmentation + 2, number_of_timesteps + 1,
+        number_of_variants) the results are written to.
+    resume_from: EnsembleResult | None
+        Result of a previous run with the same parameters whose flows agree with the
+        current flows before resume_timestep.
+    resume_timestep: int
+        First time step that is recomputed, the earlier time steps are taken from the
+        previous result.
+
+    Returns
+    -------
+    EnsembleResult
+        vessel state of every variant with the shape (segmentation + 2,
+        number_of_timesteps + 1, number_of_variants) as well as the heater and cooler
+        power of every variant with the shape (number_of_timesteps, number_of_variants),
+        which stay zero without heater settings or cooler temperature.
+    """
+
+    if resume_from is None:
+        resume_timestep = 0
+    elif (
+        not 0
+        <= resume_timestep
+        <= min(resume_from.heater_power.shape[0], flows.number_of_steps)
+    ):
+        raise ValueError(
+            f"Cannot resume at time step {resume_timestep}, the previous run has "
+            f"{resume_from.heater_power.shape[0]} and the flows have "
+            f"{flows.number_of_steps} time steps."
+        )
+
+    if all(variant is htes[0] for variant in htes):
+        # variants only differ in their control, the scalars broadcast over all columns
+        hte = htes[0]
+    else:
+        hte = stack_heat_transfer_equations(htes)
+    coefficients = hte.get_coefficient_plan()
+    number_of_steps = flows.number_of_steps
+    number_of_variants = len(htes)
+    shape = (hte.vessel.init_state.shape[0], number_of_steps + 1, number_of_variants)
+    if out is None:
+        vessel_state = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(
+            f"Output buffer has shape {out.shape}, but the simulation needs {shape}."
+        )
+    else:
+        vessel_state = out
+    heater_power_consumption = np.zeros((number_of_steps, number_of_variants))
+    cooler_power_consumption = np.zeros((number_of_steps, number_of_variants))
+    heater_on = np.zeros((number_of_steps, number_of_variants), dtype=bool)
+    heater_state_on = np.zeros(number_of_variants, dtype=bool)
+    if resume_from is None:
+        vessel_state[:, 0, :] = hte.vessel.init_state
+    else:
+        if resume_from.vessel_state.shape[::2] != shape[::2]:
+            raise ValueError(
+                f"Previous run has {resume_from.vessel_state.shape[::2]} layers and "
+                f"variants, but the simulation needs {shape[::2]}."
+            )
+        previous_steps = slice(0, resume_timestep)
+        vessel_state[:, : resume_timestep + 1] = resume_from.vessel_state[
+            :, : resume_timestep + 1
+        ]
+        heater_power_consumption[previous_steps] = resume_from.heater_power[
+            previous_steps
+        ]
+        cooler_power_consumption[previous_steps] = resume_from.cooler_power[
+            previous_steps
+        ]
+        heater_on[previous_steps] = resume_from.heater_on[previous_steps]
+        if resume_timestep > 0:
+            heater_state_on = resume_from.heater_on[resume_timestep - 1]
+
+    get_next_state = VESSEL_STATE_UPDATES[solver]
+    if solver == SolverType.EXPLICIT and sub_stepping:
+        max_mass_flow = volume_to_mass_flow(
+            np.max(flows.volume_flows, axis=0).reshape(-1, 1), hte.fluid
+        )
+        substep_counts = np.broadcast_to(
+            calc_substep_counts(coefficients, max_mass_flow, delta_t),
+            (number_of_steps, number_of_variants),
+        )
+    else:
+        substep_counts = np.ones((number_of_steps, number_of_variants), dtype=np.int64)
+
+    for timestep in range(resume_timestep, number_of_steps):
+        current_vessel_state = np.copy(vessel_state[:, timestep, :])
+        # mass flows of each variant (columns) derived from its own density
+        mass_flows = volume_to_mass_flow(
+            flows.volume_flows[:, timestep : timestep + 1], hte.fluid
+        )
+        inflow_temps: list[float | npt.NDArray[np.float64]] = list(
+            flows.flow_temps[:, timestep]
+        )
+        if heater is not None:
+            heater_state_on = temp_hysteresis_vector(
+                heater.critical_temp,
+                heater.turn_off_temp,
+                get_average_section_temps(current_vessel_state, heater.vessel_section),
+                heater_state_on,
+            )
+            heater_on[timestep] = heater_state_on
+            # every source flow is heated, the heater power is their sum
+            for i in np.flatnonzero(flows.is_source):
+                heater_power_consumption[timestep] += np.where(
+                    heater_state_on,
+                    calc_mix_power(
+                        mass_flow=mass_flows[i],
+                        c_p_fluid=hte.fluid.c_p,
+                        high_temp=heater.heating_temp,
+                        low_temp=inflow_temps[i],
+                    ),
+                    0.0,
+                )
+                inflow_temps[i] = np.where(
+                    heater_state_on, heater.heating_temp, inflow_temps[i]
+                )
+        # every variant takes its own number of sub steps, as in its single run
+        substep_delta_t = delta_t / substep_counts[timestep]
+        for substep in range(np.max(substep_counts[timestep])):
+            next_vessel_state = np.copy(current_vessel_state)
+            for i, input_type in enumerate(flows.input_types):
+                if input_type == SimType.SOURCE:
+                    next_vessel_state[0] = inflow_temps[i]
+                    next_vessel_state[-1] = next_vessel_state[-2]
+                else:
+                    next_vessel_state[0] = next_vessel_state[1]
+                    next_vessel_state[-1] = inflow_temps[i]
+                next_vessel_state = get_next_state(
+                    current_vessel_state=next_vessel_state,
+                    mass_flow=mass_flows[i],
+                    state_type=input_type,
+                    coefficients=coefficients,
+                    delta_t=substep_delta_t,
+                )
+            # variants which already took all their sub steps keep their state
+            current_vessel_state = np.where(
+                substep < substep_counts[timestep],
+                next_vessel_state,
+                current_vessel_state,
+            )
+        vessel_state[:, timestep + 1, :] = current_vessel_state
+        if cooler_temp is not None:
+            cooler_power_consumption[timestep] = calc_cooler_power(
+                layer=current_vessel_state[-2],
+                desired_temp=cooler_temp,
+                source_mass_flows=mass_flows[flows.is_source],
+                c_p_fluid=hte.fluid.c_p,
+            )
+    return EnsembleResult(
+        vessel_state=vessel_state,
+        heater_power=heater_power_consumption,
+        cooler_power=cooler_power_consumption,
+        heater_on=heater_on,
+    )
+
+
+def heater_ensemble_simulation(
+    htes: list[HeatTransferEquation],
+    flows: FlowTable,
+    delta_t: int,
+    vessel_section: float,
+    critical_temp: float | npt.NDArray[np.float64],
+    turn_off_temp: float | npt.NDArray[np.float64],
+    heating_temp: float | npt.NDArray[np.float64],
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    out: npt.NDArray[np.float64] | None = None,
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """
+    Ensemble version of simulations.heater_simulation, see ensemble_simulation. The
+    heater temperatures may be given per variant.
+    """
+
+    result = ensemble_simulation(
+        htes=htes,
+        flows=flows,
+        delta_t=delta_t,
+        heater=HeaterSettings(
+            vessel_section=vessel_section,
+            critical_temp=critical_temp,
+            turn_off_temp=turn_off_temp,
+            heating_temp=heating_temp,
+        ),
+        solver=solver,
+        sub_stepping=sub_stepping,
+        out=out,
+    )
+    return result.vessel_state, result.heater_power
+
+
+def fused_ensemble_simulation(
+    hte: HeatTransferEquation,
+    flows: FlowTable,
+    delta_t: int,
+    vessel_section: float,
+    critical_temp: float,
+    turn_off_temp: float,
+    heating_temp: float,
+    cooler_temp: float,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    resume_from: EnsembleResult | None = None,
+    resume_timestep: int = 0,
+) -> EnsembleResult:
+    """
+    Runs the base, heater and cooler simulation in a single pass over the horizon. The
+    uncontrolled and the heater controlled vessel are advanced side by side as two
+    columns of one state, where the heater of the uncontrolled column never switches on.
+    Heater and cooler power are accumulated on the fly, the input flows are not
+    modified. A previous run can be continued from resume_timestep on, see
+    ensemble_simulation.
+
+    Returns
+    -------
+    EnsembleResult
+        Result with the uncontrolled vessel as first and the heater controlled vessel as
+        second variant, see split_fused_result.
+    """
+
+    return ensemble_simulation(
+        htes=[hte, hte],
+        flows=flows,
+        delta_t=delta_t,
+        heater=HeaterSettings(
+            vessel_section=vessel_section,
+            critical_temp=np.array([-np.inf, critical_temp]),
+            turn_off_temp=np.array([-np.inf, turn_off_temp]),
+            heating_temp=heating_temp,
+        ),
+        cooler_temp=cooler_temp,
+        solver=solver,
+        sub_stepping=sub_stepping,
+        resume_from=resume_from,
+        resume_timestep=resume_timestep,
+    )
+
+
+def split_fused_result(
+    result: EnsembleResult,
+) -> Tuple[
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+]:
+    """
+    Base result, heater result (both of the shape (segmentation + 2,
+    number_of_timesteps + 1)), heater power and cooler power (both of the shape
+    (number_of_timesteps, 1)) of a fused run as returned by the separate simulations.
+    """
+
+    return (
+        result.vessel_state[:, :, 0],
+        result.vessel_state[:, :, 1],
+        result.heater_power[:, 1:],
+        result.cooler_power[:, 1:],
+    )
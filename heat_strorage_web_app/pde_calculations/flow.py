@@ -6,6 +6,14 @@ from pde_calculations.medium import Medium
 from pde_calculations.sim_enums import SimType
 
 
+def volume_to_mass_flow(
+    volume_flow: npt.NDArray[np.float64], medium: Medium
+) -> npt.NDArray[np.float64]:
+    """input: [volume_flow]=[m^3/h]
+    output: [kg/s]"""
+    return volume_flow * medium.density / (60 * 60)  # [kg/s]
+
+
 @dataclass
 class Flow:
     flow_temp: npt.NDArray[np.float64]  # FIXME: initialise with fixed empty array?
@@ -17,7 +25,7 @@ class Flow:
     def mass_flow_kg_s(self) -> npt.NDArray[np.float64]:
         """input: [volume_flow]=[m^3/h]
         output: [kg/s]"""
-        return self.volume_flow * self.medium.density / (60 * 60)  # [kg/s]
+        return volume_to_mass_flow(self.volume_flow, self.medium)
 
     @property
     def number_of_steps(self) -> int:
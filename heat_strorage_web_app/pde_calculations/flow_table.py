@@ -0,0 +1,187 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from pde_calculations.flow import volume_to_mass_flow
+from pde_calculations.medium import Medium
+from pde_calculations.sim_enums import SimType
+
+
+def read_only_view(array: npt.NDArray) -> npt.NDArray:
+    """
+    View of the array which can not be written to, the array itself stays writeable.
+    """
+
+    view = np.asarray(array).view()
+    view.flags.writeable = False
+    return view
+
+
+def calc_mix_temps(
+    flow_temps: npt.NDArray[np.float64], flows: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """
+    Mixing temperature of several flows (rows) at every time step (columns), i.e.
+    data_loader.cal_mix_temp for any number of flows. Time steps without any flow get
+    the plain mean of the flow temperatures.
+    """
+
+    total_flow = flows.sum(axis=0)
+    mix_temps = np.mean(flow_temps, axis=0)
+    np.divide(
+        (flow_temps * flows).sum(axis=0),
+        total_flow,
+        out=mix_temps,
+        where=total_flow > 0,
+    )
+    return mix_temps
+
+
+@dataclass
+class FlowTable:
+    """
+    Columnar storage of all input flows. Row i of every array belongs to flow i, the
+    columns are the time steps. The mass flows are converted once when the table is
+    built instead of on every access.
+
+    The table only holds read-only views of its arrays, so one table can be shared by
+    several simulation runs, cached or mapped from shared memory. The simulations never
+    modify their input flows.
+    """
+
+    flow_temps: npt.NDArray[np.float64]  # (number_of_flows, number_of_steps) [°C]
+    volume_flows: npt.NDArray[np.float64]  # (number_of_flows, number_of_steps) [m^3/h]
+    is_source: npt.NDArray[np.bool_]  # (number_of_flows,) source (True) or sink flow
+    medium: Medium
+    mass_flows_kg_s: npt.NDArray[np.float64] = field(init=False)  # [kg/s]
+    input_types: list[SimType] = field(init=False)
+
+    def __post_init__(self):
+        self.flow_temps = read_only_view(self.flow_temps)
+        self.volume_flows = read_only_view(self.volume_flows)
+        self.is_source = read_only_view(self.is_source)
+        self.mass_flows_kg_s = read_only_view(
+            volume_to_mass_flow(self.volume_flows, self.medium)
+        )
+        self.input_types = [
+            SimType.SOURCE if is_source else SimType.SINK
+            for is_source in self.is_source
+        ]
+
+    @property
+    def number_of_flows(self) -> int:
+        return self.flow_temps.shape[0]
+
+    @property
+    def number_of_steps(self) -> int:
+        return self.flow_temps.shape[1]
+
+    def aggregated(self) -> "FlowTable":
+        """
+        Table with one equivalent flow per side: all source flows and all sink flows are
+        mixed into one flow each (sources first), which carries the summed volume flow
+        at the mixing temperature of every time step. The simulation then models two
+        flows per time step regardless of the number of inputs. The result deviates
+        from modelling the flows one after the other, see
+        analysis_calcs.get_aggregation_report.
+        """
+
+        sides = [side for side in (True, False) if np.any(self.is_source == side)]
+        masks = [self.is_source == side for side in sides]
+        return FlowTable(
+            flow_temps=np.array(
+                [
+                    calc_mix_temps(self.flow_temps[mask], self.volume_flows[mask])
+                    for mask in masks
+                ]
+            ),
+            volume_flows=np.array(
+                [self.volume_flows[mask].sum(axis=0) for mask in masks]
+            ),
+            is_source=np.array(sides),
+            medium=self.medium,
+        )
+
+    @classmethod
+    def from_dataframe(
+        cls, df: pd.DataFrame, input_type: SimType, medium: Medium
+    ) -> "FlowTable":
+        """
+        Builds the table from a DataFrame with the columns "Temperatur i" followed by
+        "Volumenstrom i" (see raw_data_section.raw_to_df). For a DataFrame holding all
+        columns in one float block (as read from the uploads) temperatures and volume
+        flows are views of the DataFrame's data instead of copies.
+        """
+
+        number_of_flows = len(df.columns) // 2
+        header = [f"Temperatur {i}" for i in range(number_of_flows)]
+        header.extend([f"Volumenstrom {i}" for i in range(number_of_flows)])
+        if list(df.columns) != header:
+            df = df[header]
+        return cls.from_data(df.to_numpy(dtype=np.float64), input_type, medium)
+
+    @classmethod
+    def from_data(
+        cls, data: npt.NDArray[np.float64], input_type: SimType, medium: Medium
+    ) -> "FlowTable":
+        """
+        Builds the table from an array of the shape (number_of_steps, 2 *
+        number_of_flows) with the temperature columns followed by the volume flow
+        columns (see data_loader.read_flow_data). Temperatures and volume flows are
+        views of the array, e.g. of a memory-mapped file.
+        """
+
+        number_of_flows = data.shape[1] // 2
+        return cls(
+            flow_temps=data[:, :number_of_flows].T,
+            volume_flows=data[:, number_of_flows : 2 * number_of_flows].T,
+            is_source=np.full(number_of_flows, input_type == SimType.SOURCE),
+            medium=medium,
+        )
+
+    @classmethod
+    def concat(cls, tables: list["FlowTable"]) -> "FlowTable":
+        """
+        Combines the flows of several tables (e.g. sources and sinks) into one table,
+        keeping their order.
+        """
+
+        if not tables:
+            raise ValueError("At least one table of flows is needed.")
+        if len(tables) == 1:
+            return tables[0]
+        return cls(
+            flow_temps=np.concatenate([table.flow_temps for table in tables]),
+            volume_flows=np.concatenate([table.volume_flows for table in tables]),
+            is_source=np.concatenate([table.is_source for table in tables]),
+            medium=tables[0].medium,
+        )
+
+
+def get_first_changed_step(previous: FlowTable, current: FlowTable) -> int:
+    """
+    First time step at which the current flows differ from the previous flows, e.g.
+    after editing or appending measurement data. Simulation results before this time
+    step are unaffected by the change. If the flows only got longer, the first appended
+    time step is returned, identical flows give their number of time steps.
+    """
+
+    if (
+        previous.number_of_flows != current.number_of_flows
+        or previous.medium != current.medium
+        or not np.array_equal(previous.is_source, current.is_source)
+    ):
+        return 0
+    common_steps = min(previous.number_of_steps, current.number_of_steps)
+    changed = np.any(
+        (previous.flow_temps[:, :common_steps] != current.flow_temps[:, :common_steps])
+        | (
+            previous.volume_flows[:, :common_steps]
+            != current.volume_flows[:, :common_steps]
+        ),
+        axis=0,
+    )
+    if np.any(changed):
+        return int(np.argmax(changed))
+    return common_steps
@@ -1,9 +1,51 @@
 from dataclasses import dataclass
 
+import numpy as np
+import numpy.typing as npt
 from pde_calculations.environment import Environment
 from pde_calculations.medium import Medium
 from pde_calculations.vessel import Vessel
 
+# scalar for a single layer or array for a whole column (or batch of columns) of layers
+FloatArray = float | npt.NDArray[np.float64]
+
+
+@dataclass(frozen=True)
+class CoefficientPlan:
+    """
+    Coefficients of the discretised heat transfer equation, derived once per run from
+    the Medium, Vessel and Environment, so advancing the layers only takes
+    multiply-adds. Every coefficient is either a scalar, an array with one entry per
+    column of the vessel state (e.g. variants of an ensemble) or an array of the shape
+    (segmentation, 1) with one entry per layer.
+    """
+
+    diffusion: FloatArray  # weight of each neighbouring layer [1/s]
+    charge: FloatArray  # factor of the mass flow in the direct charge term [1/kg]
+    environment: FloatArray  # heat loss rate of a layer towards the environment [1/s]
+    env_temp: FloatArray  # [°C]
+    theta: FloatArray  # implicit weight of the theta scheme
+
+    def get_next_layer_temp(
+        self,
+        current_temp: FloatArray,
+        above_temp: FloatArray,
+        below_temp: FloatArray,
+        mass_flow: FloatArray,
+        inflow_temp: FloatArray,
+        delta_t: float,  # [s]
+    ) -> FloatArray:
+        """
+        Explicit (forward Euler) update of the layer temperatures, see
+        HeatTransferEquation.get_next_layer_temp.
+        """
+
+        return current_temp + delta_t * (
+            self.diffusion * (below_temp - 2 * current_temp + above_temp)
+            + self.environment * (self.env_temp - current_temp)
+            + self.charge * mass_flow * (inflow_temp - current_temp)
+        )
+
 
 @dataclass
 class HeatTransferEquation:
@@ -12,48 +54,75 @@ class HeatTransferEquation:
     env: Environment
 
     def discretised_diffusion_term(
-        self, above_temp: float, below_temp: float, current_temp: float
-    ) -> float:
-        diffusion_term = self.fluid.alpha * (
-            (below_temp - 2 * current_temp + above_temp)
-            / self.vessel.layer_thickness**2
+        self, above_temp: FloatArray, below_temp: FloatArray, current_temp: FloatArray
+    ) -> FloatArray:
+        diffusion_term = self.diffusion_coefficient * (
+            below_temp - 2 * current_temp + above_temp
         )
         return diffusion_term
 
     def direct_charge_term(
-        self, mass_flow: float, inflow_temp: float, current_temp: float
-    ) -> float:
-        direct_term = (mass_flow * (inflow_temp - current_temp)) / (
-            self.vessel.cross_sec_area
-            * self.vessel.layer_thickness
-            * self.fluid.density
-        )
+        self, mass_flow: FloatArray, inflow_temp: FloatArray, current_temp: FloatArray
+    ) -> FloatArray:
+        direct_term = self.charge_coefficient * mass_flow * (inflow_temp - current_temp)
         return direct_term
 
-    def environment_term(self, current_temp: float) -> float:
-        env_term = (
-            (self.vessel.perimeter_layer * self.vessel.thermal_conductance_iso)
-            / (self.fluid.density * self.fluid.c_p * self.vessel.cross_sec_area)
-            * (self.env.env_temp - current_temp)
-        )
+    def environment_term(self, current_temp: FloatArray) -> FloatArray:
+        env_term = self.environment_coefficient * (self.env.env_temp - current_temp)
         return env_term
 
     def get_next_layer_temp(
         self,
-        current_temp: float,
-        above_temp: float,
-        below_temp: float,
-        mass_flow: float,
-        inflow_temp: float,
-        delta_t: int,  # [s]
-    ) -> float:
-        next_temp = (
-            current_temp
-            + (
-                self.discretised_diffusion_term(above_temp, below_temp, current_temp)
-                + self.environment_term(current_temp)
-                + self.direct_charge_term(mass_flow, inflow_temp, current_temp)
-            )
-            * delta_t
+        current_temp: FloatArray,
+        above_temp: FloatArray,
+        below_temp: FloatArray,
+        mass_flow: FloatArray,
+        inflow_temp: FloatArray,
+        delta_t: float,  # [s]
+    ) -> FloatArray:
+        """
+        Explicit (forward Euler) update of the layer temperatures. All temperature
+        arguments may either be scalars for a single layer or arrays of equal shape
+        holding every layer of the vessel, in which case the whole column is updated
+        in one vectorized step. Simulation runs use the CoefficientPlan of the equation
+        instead, which does not recompute the coefficients on every call.
+        """
+
+        return self.get_coefficient_plan().get_next_layer_temp(
+            current_temp, above_temp, below_temp, mass_flow, inflow_temp, delta_t
+        )
+
+    def get_coefficient_plan(self) -> CoefficientPlan:
+        """
+        Coefficients of the equation for the current Medium, Vessel and Environment.
+        The plan is built once per simulation run and shared by all solvers.
+        """
+
+        return CoefficientPlan(
+            diffusion=self.diffusion_coefficient,
+            charge=self.charge_coefficient,
+            environment=self.environment_coefficient,
+            env_temp=self.env.env_temp,
+            theta=self.vessel.theta,
+        )
+
+    @property
+    def diffusion_coefficient(self) -> float:
+        """weight of each neighbouring layer in the discretised diffusion term [1/s]"""
+        return self.fluid.alpha / self.vessel.layer_thickness**2
+
+    @property
+    def charge_coefficient(self) -> float:
+        """factor of the mass flow in the direct charge term [1/kg]"""
+        return 1 / (
+            self.vessel.cross_sec_area
+            * self.vessel.layer_thickness
+            * self.fluid.density
+        )
+
+    @property
+    def environment_coefficient(self) -> float:
+        """heat loss rate of a layer towards the environment [1/s]"""
+        return (self.vessel.perimeter_layer * self.vessel.thermal_conductance_iso) / (
+            self.fluid.density * self.fluid.c_p * self.vessel.cross_sec_area
         )
-        return next_temp
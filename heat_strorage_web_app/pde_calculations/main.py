@@ -7,7 +7,7 @@ sys.path.append(os.path.dirname(SCRIPT_DIR))
 from pde_calculations.data_loader import RawDataLoader
 from pde_calculations.data_plot import RawDataPlot, TimeEvolutionPlot
 from pde_calculations.environment import Environment
-from pde_calculations.flow import Flow
+from pde_calculations.flow_table import FlowTable
 from pde_calculations.heat_pde import HeatTransferEquation
 from pde_calculations.medium import Medium
 from pde_calculations.sim_enums import SimType
@@ -46,25 +46,8 @@ def main() -> None:
     source_data.temperatures[0] = source_data.temperatures[0] * 1
     # ____________________________________________________________________________________
 
-    flows = [
-        Flow(
-            flow_temp=source_data.temperatures[i],
-            volume_flow=source_data.masses[i],
-            input_type=SimType.SOURCE,
-            medium=water,
-        )
-        for i in range(source_data.number_of_inputs)
-    ]
-    flows.extend(
-        [
-            Flow(
-                flow_temp=sink_data.temperatures[i],
-                volume_flow=sink_data.masses[i],
-                input_type=SimType.SINK,
-                medium=water,
-            )
-            for i in range(sink_data.number_of_inputs)
-        ]
+    flows = FlowTable.concat(
+        [source_data.to_flow_table(water), sink_data.to_flow_table(water)]
     )
     pde = HeatTransferEquation(water, test_vessel, ambient)
     base_result = base_simulation(pde, flows, delta_t=300)
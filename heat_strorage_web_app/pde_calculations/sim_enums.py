@@ -14,3 +14,15 @@ class ControllerType(Enum):
 class InitialStateType(Enum):
     EVEN_DISTRIBUTION = "linear"
     CONSTANT_DISTRIBUTION = "konstant"
+
+
+class SolverType(Enum):
+    EXPLICIT = "explizit (Euler vorwärts)"
+    IMPLICIT = "implizit (Theta-Verfahren)"
+
+
+class StorageMode(Enum):
+    FULL = "volle Auflösung"
+    DECIMATE = "jeder k-te Zeitschritt"
+    WINDOW = "Fenster (Min/Mittel/Max)"
+    TOTALS = "nur Energiesummen"
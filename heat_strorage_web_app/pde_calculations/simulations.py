@@ -1,10 +1,16 @@
-from typing import Tuple
+from dataclasses import dataclass
+from typing import Callable, Iterator, Tuple
 
 import numpy as np
 import numpy.typing as npt
-from pde_calculations.flow import Flow
-from pde_calculations.heat_pde import HeatTransferEquation
-from pde_calculations.sim_enums import SimType
+from pde_calculations.flow_table import FlowTable
+from pde_calculations.heat_pde import (
+    CoefficientPlan,
+    FloatArray,
+    HeatTransferEquation,
+)
+from pde_calculations.sim_enums import SimType, SolverType
+from pde_calculations.tridiagonal import solve_tridiagonal
 
 
 def copy_extreme_temps(
@@ -16,48 +22,52 @@ def copy_extreme_temps(
     This function compares each layer temperature with the current inflow temperature.
     Depending on charging or discharging of the vessel it makes sure that no layer
     temperature is higher or lower than the inflow repesctively.
+
+    Starting at the inflow side every layer is kept at its current temperature as long
+    as the uninterrupted run of layers is hotter (charging) or colder (discharging) than
+    the inflow. The run is determined for all layers at once by a cumulative logical and,
+    hence the vessel state may hold several independent columns (shape (layers, n)).
     """
 
     if state == SimType.SOURCE:
-        j = 1
-        while (
-            current_vessel_state[j] >= current_vessel_state[0]
-            and j <= len(current_vessel_state) - 2
-        ):
-            next_vessel_state[j] = current_vessel_state[j]
-            j += 1
+        beyond_inflow = current_vessel_state[1:-1] >= current_vessel_state[0]
+        keep_layer = np.logical_and.accumulate(beyond_inflow, axis=0)
     else:
-        j = len(current_vessel_state) - 1
-        while current_vessel_state[j] <= current_vessel_state[-1] and j >= 1:
-            next_vessel_state[j] = current_vessel_state[j]
-            j -= 1
+        beyond_inflow = current_vessel_state[1:-1] <= current_vessel_state[-1]
+        keep_layer = np.logical_and.accumulate(beyond_inflow[::-1], axis=0)[::-1]
+    next_vessel_state[1:-1] = np.where(
+        keep_layer, current_vessel_state[1:-1], next_vessel_state[1:-1]
+    )
     return next_vessel_state
 
 
 def get_next_vessel_state(
     current_vessel_state: npt.NDArray[np.float64],
-    mass_flow: float,
+    mass_flow: float | npt.NDArray[np.float64],
     state_type: SimType,
-    hte: HeatTransferEquation,
-    delta_t: int,
+    coefficients: CoefficientPlan,
+    delta_t: float,
 ) -> npt.NDArray[np.float64]:
     """
     Calculates the vessel state of the next time step. The returned state is
-    based on one flow.
+    based on one flow. All inner layers are updated in a single vectorized step.
 
     Parameters
     ----------
     current_vessel_state: npt.NDArray[np.float64]
-        1D array representing the current vessel state (every temperature for each layer)
-    mass_flow: float
+        Array of shape (segmentation + 2, n) representing the current vessel state (every
+        temperature for each layer). Usually n is 1, several columns are advanced
+        independently.
+    mass_flow: float | npt.NDArray[np.float64]
         Indicates the massflow of the current time step and the current mass flow. This
         flow corresponds to the temperature in the first or last entry of the vessel
         state array. (charging/ discharging repsectively)
     state_type: SimType
         SimType to distinguish between the different simulations of charging/ discharging
-    hte: HeatTransferEquation
-        The heat transfer equation for the current vessel, Medium and Environment.
-    delta_t: int
+    coefficients: CoefficientPlan
+        Coefficients of the heat transfer equation for the current vessel, Medium and
+        Environment.
+    delta_t: float
         Time discretization delta between each time step.
 
     Returns
@@ -67,80 +77,440 @@ def get_next_vessel_state(
         of every layer)
     """
 
+    above_temps = current_vessel_state[:-2]
+    below_temps = current_vessel_state[2:]
+    if state_type == SimType.SOURCE:
+        inflow_temps = above_temps
+    else:
+        inflow_temps = below_temps
     next_vessel_state = np.copy(current_vessel_state)
+    next_vessel_state[1:-1] = coefficients.get_next_layer_temp(
+        current_temp=current_vessel_state[1:-1],
+        above_temp=above_temps,
+        below_temp=below_temps,
+        mass_flow=mass_flow,
+        inflow_temp=inflow_temps,
+        delta_t=delta_t,
+    )
+    return copy_extreme_temps(current_vessel_state, next_vessel_state, state_type)
+
+
+def get_next_vessel_state_implicit(
+    current_vessel_state: npt.NDArray[np.float64],
+    mass_flow: float | npt.NDArray[np.float64],
+    state_type: SimType,
+    coefficients: CoefficientPlan,
+    delta_t: float,
+) -> npt.NDArray[np.float64]:
+    """
+    Calculates the vessel state of the next time step with the theta scheme. The
+    returned state is based on one flow.
+
+    The vessel's theta weights the implicit part of the scheme (0.5: Crank-Nicolson,
+    1: backward Euler, 0 reproduces the explicit update). The inflow layer is kept at
+    the inflow temperature while there is no heat flux through the opposite end of the
+    vessel. The resulting tridiagonal system is solved in O(n), which stays stable for
+    large time steps and fine segmentations where the explicit update blows up.
+
+    Stable does not mean monotone: for theta < 1 the explicit part oscillates once the
+    flow passes more than about one layer per time step, and the layers over- and
+    undershoot the inflow temperatures (Crank-Nicolson drops to -36 °C on the sample
+    data with 50 layers at delta_t = 3600 s). Backward Euler (theta = 1), the default of
+    the vessel, stays within the inflow and initial temperatures.
+
+    Parameters
+    ----------
+    current_vessel_state: npt.NDArray[np.float64]
+        Array of shape (segmentation + 2, n) representing the current vessel state (every
+        temperature for each layer).
+    mass_flow: float | npt.NDArray[np.float64]
+        Massflow of the current time step which enters the vessel with the temperature
+        in the first or last entry of the vessel state array. (charging/ discharging
+        repsectively)
+    state_type: SimType
+        SimType to distinguish between the different simulations of charging/ discharging
+    coefficients: CoefficientPlan
+        Coefficients of the heat transfer equation for the current vessel, Medium and
+        Environment.
+    delta_t: float
+        Time discretization delta between each time step.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        Array discribing the next vessel state of the next time step (every temperature
+        of every layer)
+    """
+
+    theta = coefficients.theta
+    layer_temps = current_vessel_state[1:-1]
+    # adding to zeros broadcasts the coefficients to the layers in one cheap operation
+    zeros = np.zeros(layer_temps.shape)
+    diffusion = zeros + coefficients.diffusion
+    upstream = diffusion + coefficients.charge * mass_flow
+    diagonal = -(diffusion + upstream + coefficients.environment)
+    source = zeros + coefficients.environment * coefficients.env_temp
     if state_type == SimType.SOURCE:
-        for i, layer_temp in enumerate(current_vessel_state[1:-1], 1):
-            next_vessel_state[i] = hte.get_next_layer_temp(
-                current_temp=layer_temp,
-                above_temp=current_vessel_state[i - 1],
-                below_temp=current_vessel_state[i + 1],
-                mass_flow=mass_flow,
-                inflow_temp=current_vessel_state[i - 1],
-                delta_t=delta_t,
+        lower, upper = upstream, diffusion
+        source[0] += upstream[0] * current_vessel_state[0]
+        diagonal[-1] += upper[-1]
+    else:
+        lower, upper = diffusion, upstream
+        diagonal[0] += lower[0]
+        source[-1] += upstream[-1] * current_vessel_state[-1]
+    current_rate = diagonal * layer_temps
+    current_rate[1:] += lower[1:] * layer_temps[:-1]
+    current_rate[:-1] += upper[:-1] * layer_temps[1:]
+    next_vessel_state = np.copy(current_vessel_state)
+    next_vessel_state[1:-1] = solve_tridiagonal(
+        lower=-theta * delta_t * lower,
+        diagonal=1 - theta * delta_t * diagonal,
+        upper=-theta * delta_t * upper,
+        rhs=layer_temps + delta_t * ((1 - theta) * current_rate + source),
+    )
+    return copy_extreme_temps(current_vessel_state, next_vessel_state, state_type)
+
+
+VESSEL_STATE_UPDATES = {
+    SolverType.EXPLICIT: get_next_vessel_state,
+    SolverType.IMPLICIT: get_next_vessel_state_implicit,
+}
+
+DEFAULT_CHUNK_SIZE = 1024  # time steps per chunk of iter_simulation
+
+
+@dataclass
+class SimulationCheckpoint:
+    """
+    Everything a run needs to continue after a time step: the vessel state (column
+    timestep of the full result), the state of the heater hysteresis and the energies
+    accumulated up to the time step, in total and per flow. The cooler energies are
+    None if the run did not account them, i.e. ran without a cooler.
+    """
+
+    timestep: int  # number of simulated time steps
+    vessel_state: npt.NDArray[np.float64]  # (segmentation + 2,)
+    heater_on: bool = False
+    heater_energy: float = 0.0  # [kWh]
+    cooler_energy: float | None = None  # [kWh]
+    source_energy: float = 0.0  # [kWh]
+    sink_energy: float = 0.0  # [kWh]
+    flow_energies: npt.NDArray[np.float64] | None = None  # (number_of_flows,) [kWh]
+    cooler_energies: npt.NDArray[np.float64] | None = None  # (number_of_flows,) [kWh]
+
+    def get_flow_energies(self, number_of_flows: int) -> npt.NDArray[np.float64]:
+        """
+        Source and sink energy of every flow up to the checkpoint, see
+        check_checkpoint_energies.
+        """
+
+        return check_checkpoint_energies(
+            self.timestep, self.flow_energies, number_of_flows, "flow"
+        )
+
+    def get_cooler_energies(self, number_of_flows: int) -> npt.NDArray[np.float64]:
+        """
+        Cooler energy of every flow up to the checkpoint, see
+        check_checkpoint_energies.
+        """
+
+        return check_checkpoint_energies(
+            self.timestep, self.cooler_energies, number_of_flows, "cooler"
+        )
+
+    def save(self, path: str) -> None:
+        optional_energies = {
+            key: value
+            for key, value in (
+                ("cooler_energy", self.cooler_energy),
+                ("flow_energies", self.flow_energies),
+                ("cooler_energies", self.cooler_energies),
             )
-        next_vessel_state = copy_extreme_temps(
-            current_vessel_state, next_vessel_state, state_type
+            if value is not None
+        }
+        np.savez(
+            path,
+            timestep=self.timestep,
+            vessel_state=self.vessel_state,
+            heater_on=self.heater_on,
+            energies=np.array(
+                [self.heater_energy, self.source_energy, self.sink_energy]
+            ),
+            **optional_energies,
         )
-    else:
-        for i, layer_temp in enumerate(current_vessel_state[1:-1], 1):
-            next_vessel_state[i] = hte.get_next_layer_temp(
-                current_temp=layer_temp,
-                above_temp=current_vessel_state[i - 1],
-                below_temp=current_vessel_state[i + 1],
-                mass_flow=mass_flow,
-                inflow_temp=current_vessel_state[i + 1],
-                delta_t=delta_t,
+
+    @classmethod
+    def load(cls, path: str) -> "SimulationCheckpoint":
+        with np.load(path) as data:
+            heater_energy, source_energy, sink_energy = data["energies"]
+            return cls(
+                timestep=int(data["timestep"]),
+                vessel_state=data["vessel_state"],
+                heater_on=bool(data["heater_on"]),
+                heater_energy=float(heater_energy),
+                cooler_energy=(
+                    float(data["cooler_energy"]) if "cooler_energy" in data else None
+                ),
+                source_energy=float(source_energy),
+                sink_energy=float(sink_energy),
+                flow_energies=(
+                    data["flow_energies"] if "flow_energies" in data else None
+                ),
+                cooler_energies=(
+                    data["cooler_energies"] if "cooler_energies" in data else None
+                ),
             )
-        next_vessel_state = copy_extreme_temps(
-            current_vessel_state, next_vessel_state, state_type
+
+
+def check_checkpoint_energies(
+    timestep: int,
+    energies: npt.NDArray[np.float64] | None,
+    number_of_flows: int,
+    kind: str,
+) -> npt.NDArray[np.float64]:
+    """
+    Copy of the energies per flow of a checkpoint a run continues from. A run starting
+    at the first time step starts from zero energies, a later checkpoint without
+    energies per flow cannot be continued, since the totals cannot be split over the
+    flows.
+    """
+
+    if energies is None:
+        if timestep > 0:
+            raise ValueError(
+                f"Checkpoint at time step {timestep} holds no {kind} energies per "
+                "flow, the energies of the run cannot be continued from it."
+            )
+        return np.zeros(number_of_flows)
+    if energies.shape != (number_of_flows,):
+        raise ValueError(
+            f"Checkpoint holds {kind} energies of the shape {energies.shape}, but the "
+            f"run has {number_of_flows} flows."
         )
-    return next_vessel_state
+    return np.array(energies, dtype=np.float64)
+
+
+def allocate_vessel_state(
+    hte: HeatTransferEquation,
+    number_of_steps: int,
+    out: npt.NDArray[np.float64] | None = None,
+    initial_state: npt.NDArray[np.float64] | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Provides the result matrix of a simulation run with the initial vessel state written
+    to the first column. The matrix is allocated once for the whole horizon so the
+    simulation only has to fill in the columns of each time step.
+
+    Parameters
+    ----------
+    hte: HeatTransferEquation
+        The heat transfer equation for the current vessel, Medium and Environment.
+    number_of_steps: int
+        Number of simulated time steps.
+    out: npt.NDArray[np.float64] | None
+        Optional buffer of shape (segmentation + 2, number_of_steps + 1) which is used
+        instead of a newly allocated array, e.g. to reuse memory across several runs.
+    initial_state: npt.NDArray[np.float64] | None
+        State of the first column, defaults to the initial state of the vessel.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        2D Array with the shape (segmentation + 2 rows, number_of_steps + 1 columns).
+    """
+
+    shape = (hte.vessel.init_state.shape[0], number_of_steps + 1)
+    if out is None:
+        vessel_state = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(
+            f"Output buffer has shape {out.shape}, but the simulation needs {shape}."
+        )
+    else:
+        vessel_state = out
+    if initial_state is None:
+        initial_state = hte.vessel.init_state[:, 0]
+    vessel_state[:, 0] = initial_state
+    return vessel_state
+
+
+def get_substep_counts(
+    coefficients: CoefficientPlan, flows: FlowTable, delta_t: float
+) -> npt.NDArray[np.int64]:
+    """
+    Calculates for every time step into how many sub steps the explicit update has to
+    divide it to stay stable.
+
+    The explicit update of a layer stays stable (and free of oscillations) as long as
+    the weight of the current layer temperature does not turn negative, which limits the
+    step to 1 / (2 * diffusion + environment loss + charge * mass_flow). The limit is
+    evaluated for the largest mass flow of each time step over the whole horizon at once.
+
+    Parameters
+    ----------
+    coefficients: CoefficientPlan
+        Coefficients of the heat transfer equation for the current vessel, Medium and
+        Environment.
+    flows: FlowTable
+        Table of all the flows that shall be simulated.
+    delta_t: float
+        Time discretization delta between each time step.
+
+    Returns
+    -------
+    npt.NDArray[np.int64]
+        Array of the shape (number_of_timesteps,) with the number of sub steps (at least
+        one) of each time step.
+    """
+
+    max_mass_flow = np.max(flows.mass_flows_kg_s, axis=0)
+    return calc_substep_counts(coefficients, max_mass_flow, delta_t)
+
+
+def calc_substep_counts(
+    coefficients: CoefficientPlan,
+    max_mass_flow: npt.NDArray[np.float64],
+    delta_t: float,
+) -> npt.NDArray[np.int64]:
+    """
+    Number of sub steps needed for the given (largest) mass flows, see
+    get_substep_counts. The result has the shape of the broadcasted mass flows and
+    coefficients.
+    """
+
+    max_rate = (
+        2 * coefficients.diffusion
+        + coefficients.environment
+        + coefficients.charge * np.maximum(max_mass_flow, 0)
+    )
+    return np.maximum(np.ceil(delta_t * max_rate), 1).astype(np.int64)
+
+
+def apply_flows(
+    current_vessel_state: npt.NDArray[np.float64],
+    flows: FlowTable,
+    timestep: int,
+    coefficients: CoefficientPlan,
+    delta_t: float,
+    get_next_state: Callable[..., npt.NDArray[np.float64]],
+    inflow_temps: npt.NDArray[np.float64] | None = None,
+) -> npt.NDArray[np.float64]:
+    """
+    Advances the vessel state by one (sub) time step, modelling every flow in the table
+    one after the other. The inflow temperatures of the time step may be replaced by
+    inflow_temps (one entry per flow), e.g. with the temperatures behind the heater.
+    """
+
+    flow_temps = flows.flow_temps[:, timestep] if inflow_temps is None else inflow_temps
+    mass_flows = flows.mass_flows_kg_s[:, timestep]
+    for i, input_type in enumerate(flows.input_types):
+        if input_type == SimType.SOURCE:
+            current_vessel_state[0] = flow_temps[i]
+            current_vessel_state[-1] = current_vessel_state[-2]
+        else:
+            current_vessel_state[0] = current_vessel_state[1]
+            current_vessel_state[-1] = flow_temps[i]
+        current_vessel_state = get_next_state(
+            current_vessel_state=current_vessel_state,
+            mass_flow=mass_flows[i],
+            state_type=input_type,
+            coefficients=coefficients,
+            delta_t=delta_t,
+        )
+    return current_vessel_state
+
+
+def get_run_substep_counts(
+    coefficients: CoefficientPlan,
+    flows: FlowTable,
+    delta_t: float,
+    solver: SolverType,
+    sub_stepping: bool,
+) -> npt.NDArray[np.int64]:
+    """
+    Number of sub steps a simulation run uses for each time step. Only the explicit
+    update is sub stepped, the implicit theta scheme is stable for any time step.
+    """
+
+    if solver == SolverType.EXPLICIT and sub_stepping:
+        return get_substep_counts(coefficients, flows, delta_t)
+    return np.ones(flows.number_of_steps, dtype=np.int64)
 
 
 def base_simulation(
-    hte: HeatTransferEquation, flows: list[Flow], delta_t: int
+    hte: HeatTransferEquation,
+    flows: FlowTable,
+    delta_t: int,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    out: npt.NDArray[np.float64] | None = None,
+    resume_from: SimulationCheckpoint | None = None,
+    checkpoint_interval: int = DEFAULT_CHUNK_SIZE,
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None = None,
 ) -> npt.NDArray[np.float64]:
     """
     Simulates the pure heat equation based on the input flows. Each time step the
     function models the vessel state based on every flow in the list one after the
     other before progressing to the next time step.
 
+    A run can be resumed from a checkpoint, e.g. of an interrupted run or to continue a
+    horizon whose flows were extended. The result then starts at the time step of the
+    checkpoint.
+
     Parameters
     ----------
     hte: HeatTransferEquation
         The heat transfer equation for the current vessel, Medium and Environment.
-    flows: list[Flow]
-        List of all the flows that shall be simulated.
+    flows: FlowTable
+        Table of all the flows that shall be simulated.
     delta_t: int
         Time discretization delta between each time step.
+    solver: SolverType
+        Explicit update or implicit theta scheme (weighted by the vessel's theta) used
+        to advance the vessel state.
+    sub_stepping: bool
+        Divides time steps which exceed the stability limit of the explicit update into
+        as many sub steps as needed (see get_substep_counts).
+    out: npt.NDArray[np.float64] | None
+        Optional buffer of shape (segmentation + 2, number_of_timesteps + 1) the results
+        are written to instead of a newly allocated array.
+    resume_from: SimulationCheckpoint | None
+        Checkpoint the run continues from instead of the initial vessel state.
+    checkpoint_interval: int
+        Number of time steps between two checkpoints.
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None
+        Receives a checkpoint every checkpoint_interval time steps and at the end of
+        the run, e.g. to save it with SimulationCheckpoint.save. It carries the source
+        and sink energies accumulated up to its time step.
 
     Returns
     -------
     npt.NDArray[np.float64]
-        2D Array with the shape (segmentation + 2 rows, number_of_timesteps columns) representing
-        the vessel state at each timestep.
+        2D Array with the shape (segmentation + 2 rows, number_of_timesteps + 1 columns)
+        representing the vessel state at each timestep. A resumed run only holds the
+        time steps from the checkpoint on.
     """
 
-    vessel_state = hte.vessel.init_state
-    for timestep, _ in enumerate(flows[0].flow_temp):
-        current_vessel_state = vessel_state[:, timestep].reshape(
-            hte.vessel.init_state.shape
-        )
-        for flow in flows:
-            if flow.input_type == SimType.SOURCE:
-                current_vessel_state[0] = flow.flow_temp[timestep]
-                current_vessel_state[-1] = current_vessel_state[-2]
-            else:
-                current_vessel_state[0] = current_vessel_state[1]
-                current_vessel_state[-1] = flow.flow_temp[timestep]
-            current_vessel_state = get_next_vessel_state(
-                current_vessel_state=current_vessel_state,
-                mass_flow=flow.mass_flow_kg_s[timestep],
-                state_type=flow.input_type,
-                hte=hte,
-                delta_t=delta_t,
-            )
-        vessel_state = np.hstack((vessel_state, current_vessel_state))
+    first_timestep = 0 if resume_from is None else resume_from.timestep
+    vessel_state = allocate_vessel_state(
+        hte,
+        flows.number_of_steps - first_timestep,
+        out,
+        None if resume_from is None else resume_from.vessel_state,
+    )
+    for chunk in iter_simulation(
+        hte,
+        flows,
+        delta_t,
+        None,
+        solver,
+        sub_stepping,
+        checkpoint_interval,
+        resume_from,
+    ):
+        vessel_state[:, chunk.get_columns(first_timestep)] = chunk.vessel_state
+        if on_checkpoint is not None:
+            on_checkpoint(chunk.checkpoint)
     return vessel_state
 
 
@@ -202,19 +572,21 @@ def temp_hysteresis(
 
 
 def calc_mix_power(
-    mass_flow: float, c_p_fluid: float, high_temp: float, low_temp: float
-) -> float:
+    mass_flow: FloatArray,
+    c_p_fluid: FloatArray,
+    high_temp: FloatArray,
+    low_temp: FloatArray,
+) -> FloatArray:
     """
     input: [°C, kg/s]
     output: [kJ/s=kW]
+    Negative powers are set to 0, works elementwise on arrays as well.
     """
     thermal_power = mass_flow * c_p_fluid * (high_temp - low_temp)  # [J/s]
-    if thermal_power < 0:
-        return 0
-    return thermal_power / 1000  # [kJ/s=kW]
+    return np.maximum(thermal_power, 0) / 1000  # [kJ/s=kW]
 
 
-def power_to_energy(power: float, delta_t: float) -> float:
+def power_to_energy(power: FloatArray, delta_t: float) -> FloatArray:
     """
     input: [kJ/s=kW]
     output: [kWh=kJ*2.778e-4]
@@ -224,70 +596,325 @@ def power_to_energy(power: float, delta_t: float) -> float:
     return thermal_energy  # [kWh=kJ*2.778e-4]
 
 
+def calc_flow_power(
+    flows: FlowTable, timesteps: slice, vessel_state: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """
+    Power [kW] of every flow in the time steps, of the shape (number_of_flows, steps).
+    Each source flow is taken against the bottom layer outflow and each sink flow
+    against the top layer outflow (vessel_state holds the states after each time
+    step), see analysis_calcs.get_in_out_energy_cons.
+    """
+
+    is_source = flows.is_source
+    mass_flows = flows.mass_flows_kg_s[:, timesteps]
+    flow_temps = flows.flow_temps[:, timesteps]
+    c_p_fluid = flows.medium.c_p
+    flow_power = np.zeros(mass_flows.shape)
+    flow_power[is_source] = calc_mix_power(
+        mass_flows[is_source], c_p_fluid, flow_temps[is_source], vessel_state[-2]
+    )
+    flow_power[~is_source] = calc_mix_power(
+        mass_flows[~is_source], c_p_fluid, vessel_state[1], flow_temps[~is_source]
+    )
+    return flow_power
+
+
+@dataclass
+class HeaterSettings:
+    """
+    Heater thresholds (see temp_hysteresis). In an ensemble each entry is either one
+    value for all variants or an array with one value per variant.
+    """
+
+    vessel_section: float
+    critical_temp: float | npt.NDArray[np.float64]
+    turn_off_temp: float | npt.NDArray[np.float64]
+    heating_temp: float | npt.NDArray[np.float64]
+
+
+@dataclass
+class SimulationChunk:
+    start: int  # first time step of the chunk
+    vessel_state: npt.NDArray[np.float64]  # (segmentation + 2, steps) after each step
+    heater_power: npt.NDArray[np.float64]  # (steps, 1) [kW]
+    inlet_temps: npt.NDArray[np.float64]  # (number_of_flows, steps) behind the heater
+    checkpoint: SimulationCheckpoint  # after the last time step of the chunk
+
+    @property
+    def number_of_steps(self) -> int:
+        return self.vessel_state.shape[1]
+
+    @property
+    def timesteps(self) -> slice:
+        """time steps of the chunk, e.g. rows of the heater power of a whole run"""
+        return self.get_timesteps()
+
+    def get_timesteps(self, first_timestep: int = 0) -> slice:
+        """time steps of the chunk counted from the first time step of a run"""
+        start = self.start - first_timestep
+        return slice(start, start + self.number_of_steps)
+
+    def get_columns(self, first_timestep: int = 0) -> slice:
+        """columns of the chunk in the vessel state of a run from the first time step"""
+        start = self.start - first_timestep + 1
+        return slice(start, start + self.number_of_steps)
+
+
+def iter_simulation(
+    hte: HeatTransferEquation,
+    flows: FlowTable,
+    delta_t: int,
+    heater: HeaterSettings | None = None,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume_from: SimulationCheckpoint | None = None,
+) -> Iterator[SimulationChunk]:
+    """
+    Streams a simulation run chunk by chunk as it advances instead of returning the
+    states of the whole horizon at the end. Only the current chunk is held in memory, so
+    consumers (energy accounting, exports, downsampling) can process arbitrarily long
+    horizons in constant memory or stop the run early by no longer iterating.
+    base_simulation and heater_simulation collect the chunks into the full result.
+
+    Parameters
+    ----------
+    hte: HeatTransferEquation
+        The heat transfer equation for the current vessel, Medium and Environment. The
+        run starts at the initial state of the vessel.
+    flows: FlowTable
+        Table of all the flows that shall be simulated.
+    delta_t: int
+        Time discretization delta between each time step.
+    heater: HeaterSettings | None
+        Heater thresholds, without settings the pure heat equation is simulated.
+    solver: SolverType
+        Explicit update or implicit theta scheme used to advance the vessel state.
+    sub_stepping: bool
+        Divides time steps which exceed the stability limit of the explicit update into
+        as many sub steps as needed (see get_substep_counts).
+    chunk_size: int
+        Number of time steps per chunk, the last chunk may be shorter.
+    resume_from: SimulationCheckpoint | None
+        Checkpoint the run continues from instead of the initial vessel state, the
+        first chunk starts at its time step.
+
+    Yields
+    ------
+    SimulationChunk
+        Vessel states after each time step of the chunk, heater power and inflow
+        temperatures (including the heater) of each time step as well as the checkpoint
+        after the chunk. Every chunk owns its arrays.
+    """
+
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size has to be positive, got {chunk_size}.")
+    if resume_from is None:
+        resume_from = SimulationCheckpoint(
+            timestep=0, vessel_state=hte.vessel.init_state[:, 0]
+        )
+    number_of_steps = flows.number_of_steps
+    if not 0 <= resume_from.timestep <= number_of_steps:
+        raise ValueError(
+            f"Checkpoint at time step {resume_from.timestep} lies outside of the "
+            f"{number_of_steps} time steps of the flows."
+        )
+    if resume_from.vessel_state.shape != hte.vessel.init_state[:, 0].shape:
+        raise ValueError(
+            f"Checkpoint state has shape {resume_from.vessel_state.shape}, but the "
+            f"vessel needs {hte.vessel.init_state[:, 0].shape}."
+        )
+    get_next_state = VESSEL_STATE_UPDATES[solver]
+    coefficients = hte.get_coefficient_plan()
+    substep_counts = get_run_substep_counts(
+        coefficients, flows, delta_t, solver, sub_stepping
+    )
+    current_vessel_state = np.array(resume_from.vessel_state, dtype=np.float64)
+    current_vessel_state = current_vessel_state.reshape(-1, 1)
+    heater_state_on = resume_from.heater_on
+    heater_energy = resume_from.heater_energy
+    flow_energies = resume_from.get_flow_energies(flows.number_of_flows)
+    for start in range(resume_from.timestep, number_of_steps, chunk_size):
+        steps = min(chunk_size, number_of_steps - start)
+        chunk = SimulationChunk(
+            start=start,
+            vessel_state=np.empty((current_vessel_state.shape[0], steps)),
+            heater_power=np.zeros((steps, 1)),
+            inlet_temps=np.array(flows.flow_temps[:, start : start + steps]),
+            checkpoint=resume_from,
+        )
+        for offset, timestep in enumerate(range(start, start + steps)):
+            if heater is not None:
+                average_section_temp = get_average_section_temp(
+                    current_vessel_state, heater.vessel_section
+                )
+                heater_state_on = temp_hysteresis(
+                    heater.critical_temp,
+                    heater.turn_off_temp,
+                    average_section_temp,
+                    heater_state_on,
+                )
+                if heater_state_on:
+                    # every source flow is heated, the heater power is their sum
+                    for i in np.flatnonzero(flows.is_source):
+                        chunk.heater_power[offset] += calc_mix_power(
+                            mass_flow=flows.mass_flows_kg_s[i, timestep],
+                            c_p_fluid=hte.fluid.c_p,
+                            high_temp=heater.heating_temp,
+                            low_temp=flows.flow_temps[i, timestep],
+                        )
+                        chunk.inlet_temps[i, offset] = heater.heating_temp
+            substep_delta_t = delta_t / substep_counts[timestep]
+            for _ in range(substep_counts[timestep]):
+                current_vessel_state = apply_flows(
+                    current_vessel_state,
+                    flows,
+                    timestep,
+                    coefficients,
+                    substep_delta_t,
+                    get_next_state,
+                    chunk.inlet_temps[:, offset],
+                )
+            chunk.vessel_state[:, offset] = current_vessel_state[:, 0]
+        heater_energy += power_to_energy(float(np.sum(chunk.heater_power)), delta_t)
+        flow_energies += power_to_energy(
+            calc_flow_power(flows, chunk.timesteps, chunk.vessel_state).sum(axis=1),
+            delta_t,
+        )
+        # without a cooler temperature the run does not account cooler energies
+        chunk.checkpoint = SimulationCheckpoint(
+            timestep=start + steps,
+            vessel_state=np.copy(current_vessel_state[:, 0]),
+            heater_on=heater_state_on,
+            heater_energy=heater_energy,
+            source_energy=float(np.sum(flow_energies[flows.is_source])),
+            sink_energy=float(np.sum(flow_energies[~flows.is_source])),
+            flow_energies=np.copy(flow_energies),
+        )
+        yield chunk
+
+
 def heater_simulation(
     hte: HeatTransferEquation,
-    flows: list[Flow],
+    flows: FlowTable,
     delta_t: int,
     vessel_section: float,
     critical_temp: float,
     turn_off_temp: float,
     heating_temp: float,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    out: npt.NDArray[np.float64] | None = None,
+    inlet_temps_out: npt.NDArray[np.float64] | None = None,
+    resume_from: SimulationCheckpoint | None = None,
+    checkpoint_interval: int = DEFAULT_CHUNK_SIZE,
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None = None,
 ) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
-    vessel_state = hte.vessel.init_state
-    heater_power_consumption = np.zeros((flows[0].number_of_steps, 1))
-    heater_state_on = False
-    for timestep, _ in enumerate(flows[0].flow_temp):
-        current_vessel_state = vessel_state[:, timestep].reshape(
-            hte.vessel.init_state.shape
-        )
-        average_section_temp = get_average_section_temp(
-            current_vessel_state, vessel_section
-        )
-        heater_state_on = temp_hysteresis(
-            critical_temp, turn_off_temp, average_section_temp, heater_state_on
+    """
+    Simulates the heat equation like base_simulation, while a heater heats the source
+    flows to the heating temperature as long as the average temperature of the upper
+    vessel section is below the critical temperature (until it reaches the turn off
+    temperature). The input flows are not modified, the inlet temperatures behind the
+    heater can be written to a separate array.
+
+    Parameters
+    ----------
+    inlet_temps_out: npt.NDArray[np.float64] | None
+        Optional array of shape (number_of_flows, number_of_timesteps) receiving the
+        inflow temperature of every flow and time step including the heater.
+
+    Further parameters see base_simulation and temp_hysteresis. The checkpoints carry
+    the state of the heater hysteresis and the accumulated heater, source and sink
+    energies.
+
+    Returns
+    -------
+    Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]
+        vessel state of the shape (segmentation + 2, number_of_timesteps + 1) and the
+        heater power of the shape (number_of_timesteps, 1) [kW]. A resumed run only
+        holds the time steps from the checkpoint on.
+    """
+
+    first_timestep = 0 if resume_from is None else resume_from.timestep
+    number_of_steps = flows.number_of_steps - first_timestep
+    inlet_temps_shape = (flows.number_of_flows, number_of_steps)
+    if inlet_temps_out is not None and inlet_temps_out.shape != inlet_temps_shape:
+        raise ValueError(
+            f"Inlet temperature buffer has shape {inlet_temps_out.shape}, but the "
+            f"flows need {inlet_temps_shape}."
         )
-        for flow in flows:
-            if flow.input_type == SimType.SOURCE:
-                if heater_state_on:
-                    heater_power_consumption[timestep] = calc_mix_power(
-                        mass_flow=flow.mass_flow_kg_s[timestep],
-                        c_p_fluid=hte.fluid.c_p,
-                        high_temp=heating_temp,
-                        low_temp=flow.flow_temp[timestep],
-                    )
-                    flow.flow_temp[timestep] = heating_temp
-                current_vessel_state[0] = flow.flow_temp[timestep]
-                current_vessel_state[-1] = current_vessel_state[-2]
-            else:
-                current_vessel_state[0] = current_vessel_state[1]
-                current_vessel_state[-1] = flow.flow_temp[timestep]
-            current_vessel_state = get_next_vessel_state(
-                current_vessel_state=current_vessel_state,
-                mass_flow=flow.mass_flow_kg_s[timestep],
-                state_type=flow.input_type,
-                hte=hte,
-                delta_t=delta_t,
-            )
-        vessel_state = np.hstack((vessel_state, current_vessel_state))
+    vessel_state = allocate_vessel_state(
+        hte,
+        number_of_steps,
+        out,
+        None if resume_from is None else resume_from.vessel_state,
+    )
+    heater_power_consumption = np.zeros((number_of_steps, 1))
+    heater = HeaterSettings(
+        vessel_section=vessel_section,
+        critical_temp=critical_temp,
+        turn_off_temp=turn_off_temp,
+        heating_temp=heating_temp,
+    )
+    for chunk in iter_simulation(
+        hte,
+        flows,
+        delta_t,
+        heater,
+        solver,
+        sub_stepping,
+        checkpoint_interval,
+        resume_from,
+    ):
+        vessel_state[:, chunk.get_columns(first_timestep)] = chunk.vessel_state
+        heater_power_consumption[
+            chunk.get_timesteps(first_timestep)
+        ] = chunk.heater_power
+        if inlet_temps_out is not None:
+            inlet_temps_out[:, chunk.get_timesteps(first_timestep)] = chunk.inlet_temps
+        if on_checkpoint is not None:
+            on_checkpoint(chunk.checkpoint)
     return vessel_state, heater_power_consumption
 
 
+def calc_cooler_power(
+    layer: FloatArray,
+    desired_temp: FloatArray,
+    source_mass_flows: npt.NDArray[np.float64],
+    c_p_fluid: float,
+) -> FloatArray:
+    """
+    Power [kW] the cooler needs to cool the bottom layer outflow of the source flows,
+    which returns to the producers, down to the desired temperature. source_mass_flows
+    holds one row per source flow, its columns are the time steps (or variants) of
+    layer, the power is summed over the flows.
+    """
+
+    return np.sum(
+        calc_mix_power(source_mass_flows, c_p_fluid, layer, desired_temp), axis=0
+    )
+
+
 def cooler_simulation(
     layer: npt.NDArray[np.float64],
     desired_temp: float,
-    flows: list[Flow],
+    flows: FlowTable,
     c_p_fluid: float,
 ) -> npt.NDArray[np.float64]:
-    cooler_power_consumption = np.zeros(len(layer))
-    for i, temp in enumerate(layer):
-        if (
-            temp > desired_temp
-        ):  # TODO: this "if" might be unnecessary now since calc mix power returns 0
-            for flow in flows:
-                cooler_power_consumption[i] += calc_mix_power(
-                    flow.mass_flow_kg_s[i], c_p_fluid, temp, desired_temp
-                )
-    return cooler_power_consumption.reshape((len(cooler_power_consumption), 1))
+    """
+    Cooler power of every time step for the bottom layer temperatures after each
+    time step (layer, i.e. simulation_result[-2, 1:]), computed for all time steps at
+    once. Returns an array of the shape (number_of_timesteps, 1).
+    """
+
+    cooler_power_consumption = calc_cooler_power(
+        layer,
+        desired_temp,
+        flows.mass_flows_kg_s[flows.is_source, : len(layer)],
+        c_p_fluid,
+    )
+    return cooler_power_consumption.reshape((len(layer), 1))
 
 
 SIMULATIONS = {
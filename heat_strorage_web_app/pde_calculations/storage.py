@@ -0,0 +1,336 @@
+from dataclasses import dataclass, field, replace
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+from pde_calculations.flow_table import FlowTable
+from pde_calculations.heat_pde import HeatTransferEquation
+from pde_calculations.sim_enums import SolverType, StorageMode
+from pde_calculations.simulations import (
+    DEFAULT_CHUNK_SIZE,
+    HeaterSettings,
+    SimulationCheckpoint,
+    SimulationChunk,
+    calc_flow_power,
+    calc_mix_power,
+    iter_simulation,
+    power_to_energy,
+)
+
+
+@dataclass
+class StoragePolicy:
+    """
+    Which vessel states of a run are kept: every state (FULL), every k-th state
+    (DECIMATE), the minimum, mean and maximum of every window of k time steps (WINDOW),
+    e.g. k = 12 for hourly windows at a time step of 300 s, or none at all (TOTALS), if
+    only the energies of the run are needed.
+    """
+
+    mode: StorageMode = StorageMode.FULL
+    step: int = 1  # k, number of time steps per stored state
+
+    def __post_init__(self):
+        if self.step < 1:
+            raise ValueError(f"Storage step has to be positive, got {self.step}.")
+
+
+@dataclass
+class PowerTraces:
+    heater_power: npt.NDArray[np.float64]  # (steps,) [kW]
+    cooler_power: npt.NDArray[np.float64]  # (steps,) [kW]
+    flow_power: npt.NDArray[np.float64]  # (number_of_flows, steps) [kW]
+
+
+@dataclass
+class StoredResult:
+    timesteps: npt.NDArray[np.int64]  # column of each stored state in the full result
+    vessel_state: npt.NDArray[np.float64]  # (segmentation + 2, stored) state or mean
+    min_state: npt.NDArray[np.float64] | None  # minimum of each window (WINDOW only)
+    max_state: npt.NDArray[np.float64] | None  # maximum of each window (WINDOW only)
+    heater_energy: float = 0.0  # [kWh]
+    cooler_energy: float = 0.0  # [kWh]
+    source_energy: float = 0.0  # [kWh]
+    sink_energy: float = 0.0  # [kWh]
+    flow_energies: npt.NDArray[np.float64] | None = None  # see EnergyAccumulator
+    cooler_energies: npt.NDArray[np.float64] | None = None  # see EnergyAccumulator
+    power_traces: PowerTraces | None = None  # power of every time step, if kept
+
+
+@dataclass
+class EnergyAccumulator:
+    """
+    Running energy totals of a streamed run, updated with every chunk while the run
+    advances, so no state history is needed afterwards. Source and sink energies are
+    kept per flow: each source flow's energy against the bottom layer outflow and each
+    sink flow's energy against the top layer outflow, i.e. the energies of
+    analysis_calcs.get_in_out_energy_cons. The cooler cools the bottom layer outflow of
+    every source flow to the cooler temperature (see simulations.calc_cooler_power).
+    With keep_traces the power of every time step is collected as well.
+    """
+
+    flows: FlowTable
+    delta_t: float
+    cooler_temp: float | None = None
+    keep_traces: bool = False
+    heater_energy: float = 0.0  # [kWh]
+    flow_energies: npt.NDArray[np.float64] = field(init=False)  # (flows,) [kWh]
+    cooler_energies: npt.NDArray[np.float64] = field(init=False)  # (flows,) [kWh]
+    traces: list[PowerTraces] = field(init=False)
+
+    def __post_init__(self):
+        self.flow_energies = np.zeros(self.flows.number_of_flows)
+        self.cooler_energies = np.zeros(self.flows.number_of_flows)
+        self.traces = []
+
+    @property
+    def cooler_energy(self) -> float:
+        return float(np.sum(self.cooler_energies))
+
+    @property
+    def source_energy(self) -> float:
+        return float(np.sum(self.flow_energies[self.flows.is_source]))
+
+    @property
+    def sink_energy(self) -> float:
+        return float(np.sum(self.flow_energies[~self.flows.is_source]))
+
+    def resume(self, checkpoint: SimulationCheckpoint) -> None:
+        """
+        Continues from the energies per flow of a checkpoint. Raises a ValueError if
+        the checkpoint lacks them, e.g. the cooler energies of a run without cooler,
+        see simulations.check_checkpoint_energies.
+        """
+
+        number_of_flows = self.flows.number_of_flows
+        self.heater_energy = checkpoint.heater_energy
+        self.flow_energies = checkpoint.get_flow_energies(number_of_flows)
+        if self.cooler_temp is not None:
+            self.cooler_energies = checkpoint.get_cooler_energies(number_of_flows)
+
+    def add(self, chunk: SimulationChunk) -> None:
+        """
+        Adds the energies of the time steps of a chunk.
+        """
+
+        is_source = self.flows.is_source
+        mass_flows = self.flows.mass_flows_kg_s[:, chunk.timesteps]
+        flow_power = calc_flow_power(self.flows, chunk.timesteps, chunk.vessel_state)
+        cooler_power = np.zeros(mass_flows.shape)
+        if self.cooler_temp is not None:
+            cooler_power[is_source] = calc_mix_power(
+                mass_flows[is_source],
+                self.flows.medium.c_p,
+                chunk.vessel_state[-2],
+                self.cooler_temp,
+            )
+        self.heater_energy += power_to_energy(
+            float(np.sum(chunk.heater_power)), self.delta_t
+        )
+        self.flow_energies += power_to_energy(flow_power.sum(axis=1), self.delta_t)
+        self.cooler_energies += power_to_energy(cooler_power.sum(axis=1), self.delta_t)
+        if self.keep_traces:
+            self.traces.append(
+                PowerTraces(
+                    heater_power=chunk.heater_power[:, 0],
+                    cooler_power=cooler_power.sum(axis=0),
+                    flow_power=flow_power,
+                )
+            )
+
+    def get_checkpoint(self, checkpoint: SimulationCheckpoint) -> SimulationCheckpoint:
+        """
+        Checkpoint of a chunk with the accumulated cooler energies, the heater, source
+        and sink energies are accounted by the simulation itself. Without a cooler
+        temperature the cooler energies stay None.
+        """
+
+        if self.cooler_temp is None:
+            return checkpoint
+        return replace(
+            checkpoint,
+            cooler_energy=self.cooler_energy,
+            cooler_energies=np.copy(self.cooler_energies),
+        )
+
+    def get_power_traces(self) -> PowerTraces | None:
+        if not self.keep_traces:
+            return None
+        return PowerTraces(
+            heater_power=np.concatenate(
+                [trace.heater_power for trace in self.traces] or [np.zeros(0)]
+            ),
+            cooler_power=np.concatenate(
+                [trace.cooler_power for trace in self.traces] or [np.zeros(0)]
+            ),
+            flow_power=np.hstack(
+                [trace.flow_power for trace in self.traces]
+                or [np.zeros((self.flows.number_of_flows, 0))]
+            ),
+        )
+
+
+@dataclass
+class StateRecorder:
+    """
+    Collects the vessel states of a streamed run according to the storage policy. The
+    states have to be recorded in order, windows start at multiples of the policy step
+    counted from the first time step.
+    """
+
+    policy: StoragePolicy
+    initial_state: npt.NDArray[np.float64]  # (segmentation + 2,)
+    first_timestep: int = 0  # column of the initial state in the full result
+    timesteps: list[npt.NDArray[np.int64]] = field(init=False)
+    states: list[npt.NDArray[np.float64]] = field(init=False)
+    min_states: list[npt.NDArray[np.float64]] = field(init=False)
+    max_states: list[npt.NDArray[np.float64]] = field(init=False)
+
+    def __post_init__(self):
+        self.timesteps = []
+        self.states = []
+        self.min_states = []
+        self.max_states = []
+        if self.policy.mode in (StorageMode.FULL, StorageMode.DECIMATE):
+            self.timesteps.append(np.array([self.first_timestep]))
+            self.states.append(self.initial_state.reshape(-1, 1))
+
+    def record(self, start: int, vessel_state: npt.NDArray[np.float64]) -> None:
+        """
+        Records the states after the time steps start, start + 1, ... (columns of
+        vessel_state), i.e. the columns start + 1, ... of the full result.
+        """
+
+        step = self.policy.step
+        columns = np.arange(start + 1, start + 1 + vessel_state.shape[1])
+        match self.policy.mode:
+            case StorageMode.FULL:
+                self.timesteps.append(columns)
+                self.states.append(np.copy(vessel_state))
+            case StorageMode.DECIMATE:
+                keep = columns % step == 0
+                self.timesteps.append(columns[keep])
+                self.states.append(vessel_state[:, keep])
+            case StorageMode.WINDOW:
+                if (start - self.first_timestep) % step:
+                    raise ValueError(
+                        f"Recorded states start at {start}, which is not the start of a "
+                        f"window of {step} time steps."
+                    )
+                window_starts = np.arange(0, vessel_state.shape[1], step)
+                self.timesteps.append(
+                    np.minimum(columns[window_starts] + step - 1, columns[-1])
+                )
+                self.states.append(
+                    np.add.reduceat(vessel_state, window_starts, axis=1)
+                    / np.diff(np.append(window_starts, vessel_state.shape[1]))
+                )
+                self.min_states.append(
+                    np.minimum.reduceat(vessel_state, window_starts, axis=1)
+                )
+                self.max_states.append(
+                    np.maximum.reduceat(vessel_state, window_starts, axis=1)
+                )
+            case StorageMode.TOTALS:
+                pass
+
+    def get_result(self) -> StoredResult:
+        windowed = self.policy.mode == StorageMode.WINDOW
+        layers = self.initial_state.shape[0]
+        return StoredResult(
+            timesteps=np.concatenate(self.timesteps or [np.zeros(0, dtype=np.int64)]),
+            vessel_state=np.hstack(self.states or [np.empty((layers, 0))]),
+            min_state=np.hstack(self.min_states) if windowed and self.states else None,
+            max_state=np.hstack(self.max_states) if windowed and self.states else None,
+        )
+
+
+def stored_simulation(
+    hte: HeatTransferEquation,
+    flows: FlowTable,
+    delta_t: int,
+    policy: StoragePolicy,
+    heater: HeaterSettings | None = None,
+    cooler_temp: float | None = None,
+    solver: SolverType = SolverType.EXPLICIT,
+    sub_stepping: bool = True,
+    resume_from: SimulationCheckpoint | None = None,
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None = None,
+    keep_power_traces: bool = False,
+) -> StoredResult:
+    """
+    Runs a base or heater simulation (see simulations.iter_simulation) and only keeps the
+    vessel states selected by the storage policy. The heater, cooler, source and sink
+    energies are accumulated from every time step while the run advances (see
+    EnergyAccumulator), so they are exact regardless of the policy.
+
+    Parameters
+    ----------
+    hte: HeatTransferEquation
+        The heat transfer equation for the current vessel, Medium and Environment.
+    flows: FlowTable
+        Table of all the flows that shall be simulated.
+    delta_t: int
+        Time discretization delta between each time step.
+    policy: StoragePolicy
+        Vessel states to keep.
+    heater: HeaterSettings | None
+        Heater thresholds, without settings the pure heat equation is simulated.
+    cooler_temp: float | None
+        Temperature the bottom layer outflow is cooled to, without a temperature the
+        cooler energy stays zero.
+    solver: SolverType
+        Explicit update or implicit theta scheme used to advance the vessel state.
+    sub_stepping: bool
+        Divides time steps which exceed the stability limit of the explicit update into
+        as many sub steps as needed.
+    resume_from: SimulationCheckpoint | None
+        Checkpoint the run continues from, its energies are included in the totals.
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None
+        Receives a checkpoint with the accumulated energies after every chunk.
+    keep_power_traces: bool
+        Keeps the heater, cooler and flow power of every time step as well.
+
+    Returns
+    -------
+    StoredResult
+        Stored vessel states with their columns in the full result and the energies
+        of the run, in total and per flow.
+    """
+
+    if resume_from is None:
+        resume_from = SimulationCheckpoint(
+            timestep=0, vessel_state=hte.vessel.init_state[:, 0]
+        )
+    recorder = StateRecorder(
+        policy=policy,
+        initial_state=resume_from.vessel_state,
+        first_timestep=resume_from.timestep,
+    )
+    chunk_size = DEFAULT_CHUNK_SIZE
+    if policy.mode == StorageMode.WINDOW:
+        # chunks cover whole windows
+        chunk_size = policy.step * max(DEFAULT_CHUNK_SIZE // policy.step, 1)
+    energies = EnergyAccumulator(
+        flows=flows,
+        delta_t=delta_t,
+        cooler_temp=cooler_temp,
+        keep_traces=keep_power_traces,
+    )
+    energies.resume(resume_from)
+    for chunk in iter_simulation(
+        hte, flows, delta_t, heater, solver, sub_stepping, chunk_size, resume_from
+    ):
+        recorder.record(chunk.start, chunk.vessel_state)
+        energies.add(chunk)
+        if on_checkpoint is not None:
+            on_checkpoint(energies.get_checkpoint(chunk.checkpoint))
+    result = recorder.get_result()
+    result.heater_energy = energies.heater_energy
+    result.cooler_energy = energies.cooler_energy
+    result.source_energy = energies.source_energy
+    result.sink_energy = energies.sink_energy
+    result.flow_energies = energies.flow_energies
+    result.cooler_energies = energies.cooler_energies
+    result.power_traces = energies.get_power_traces()
+    return result
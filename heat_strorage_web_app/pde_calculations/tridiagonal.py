@@ -0,0 +1,85 @@
+import numpy as np
+import numpy.typing as npt
+
+# up to this many systems the sweep runs on Python floats, see solve_tridiagonal
+SCALAR_SWEEP_LIMIT = 8
+
+
+def solve_tridiagonal(
+    lower: npt.NDArray[np.float64],
+    diagonal: npt.NDArray[np.float64],
+    upper: npt.NDArray[np.float64],
+    rhs: npt.NDArray[np.float64],
+) -> npt.NDArray[np.float64]:
+    """
+    Solves a tridiagonal linear system with the Thomas algorithm in O(n).
+
+    The system is solved along the first axis. Any further axes are treated as
+    independent systems of the same size which are solved at once, e.g. several vessel
+    columns of shape (layers, n).
+
+    The sweep runs row by row. For a few systems (e.g. a single vessel) it runs on
+    Python floats, which avoids the overhead of a NumPy call per row and is several
+    times faster. For many systems (e.g. an ensemble) every row is one NumPy operation
+    over all systems. Both give the same result.
+
+    Parameters
+    ----------
+    lower: npt.NDArray[np.float64]
+        Sub diagonal of the matrix, entry i belongs to row i. The first entry is ignored.
+    diagonal: npt.NDArray[np.float64]
+        Main diagonal of the matrix.
+    upper: npt.NDArray[np.float64]
+        Super diagonal of the matrix, entry i belongs to row i. The last entry is ignored.
+    rhs: npt.NDArray[np.float64]
+        Right hand side of the system.
+
+    Returns
+    -------
+    npt.NDArray[np.float64]
+        Solution of the system with the shape of the right hand side.
+    """
+
+    lower, diagonal, upper, rhs = np.broadcast_arrays(lower, diagonal, upper, rhs)
+    number_of_rows = rhs.shape[0]
+    if rhs.size <= SCALAR_SWEEP_LIMIT * number_of_rows:
+        systems = zip(
+            *(
+                array.reshape(number_of_rows, -1).T.tolist()
+                for array in (lower, diagonal, upper, rhs)
+            )
+        )
+        solutions = [solve_tridiagonal_scalar(*system) for system in systems]
+        return np.array(solutions, dtype=np.float64).T.reshape(rhs.shape)
+    upper_prime = np.empty(rhs.shape)
+    rhs_prime = np.empty(rhs.shape)
+    upper_prime[0] = upper[0] / diagonal[0]
+    rhs_prime[0] = rhs[0] / diagonal[0]
+    for i in range(1, number_of_rows):
+        denominator = diagonal[i] - lower[i] * upper_prime[i - 1]
+        upper_prime[i] = upper[i] / denominator
+        rhs_prime[i] = (rhs[i] - lower[i] * rhs_prime[i - 1]) / denominator
+    solution = np.empty(rhs.shape)
+    solution[-1] = rhs_prime[-1]
+    for i in range(number_of_rows - 2, -1, -1):
+        solution[i] = rhs_prime[i] - upper_prime[i] * solution[i + 1]
+    return solution
+
+
+def solve_tridiagonal_scalar(
+    lower: list[float], diagonal: list[float], upper: list[float], rhs: list[float]
+) -> list[float]:
+    """
+    Thomas algorithm for a single system given as lists, see solve_tridiagonal.
+    """
+
+    number_of_rows = len(rhs)
+    upper_prime = [upper[0] / diagonal[0]] * number_of_rows
+    solution = [rhs[0] / diagonal[0]] * number_of_rows
+    for i in range(1, number_of_rows):
+        denominator = diagonal[i] - lower[i] * upper_prime[i - 1]
+        upper_prime[i] = upper[i] / denominator
+        solution[i] = (rhs[i] - lower[i] * solution[i - 1]) / denominator
+    for i in range(number_of_rows - 2, -1, -1):
+        solution[i] -= upper_prime[i] * solution[i + 1]
+    return solution
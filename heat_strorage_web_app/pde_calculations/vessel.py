@@ -19,7 +19,9 @@ class Vessel:
     height: float
     radius: float
     segmentation: int
-    theta: float = 0.5  # Verhältnis von einem Segmentvolumen zu zwei Segmentvolumina
+    # implizite Gewichtung (0.5: Crank-Nicolson, 1: Euler rückwärts), nur 1 bleibt bei
+    # groben Zeitschritten monoton (siehe get_next_vessel_state_implicit)
+    theta: float = 1.0
     initial_state: str = InitialStateType.EVEN_DISTRIBUTION.value
     min_value: float = 20
     max_value: float = 80
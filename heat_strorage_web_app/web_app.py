@@ -3,9 +3,8 @@ from web_application.raw_data_section import display_raw_data_section
 from web_application.sidebar_builder import build_sidebar
 
 from web_application.backend_connection import (
-    get_base_simulation_results,
-    get_cooler_simulation_results,
-    get_heater_simulation_results,
+    get_fused_simulation_results,
+    get_simulation_context,
 )
 from web_application.result_section import display_result_section
 
@@ -20,10 +19,22 @@ def main():
     build_sidebar()
     display_raw_data_section()
     if st.session_state.sim_button:
-        base_result = get_base_simulation_results()
-        heater_result, heater_power = get_heater_simulation_results()
-        cooler_power = get_cooler_simulation_results(sim_result=heater_result)
+        context = get_simulation_context()
+        # kept for later reruns, e.g. when the time range of the plots is changed
+        st.session_state.last_simulation = (
+            context,
+            *get_fused_simulation_results(context),
+        )
+    if "last_simulation" in st.session_state:
+        (
+            context,
+            base_result,
+            heater_result,
+            heater_power,
+            cooler_power,
+        ) = st.session_state.last_simulation
         display_result_section(
+            context=context,
             base_result=base_result,
             heater_result=heater_result,
             heater_power=heater_power,
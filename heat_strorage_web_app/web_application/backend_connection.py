@@ -1,164 +1,279 @@
-from typing import Tuple
+from dataclasses import dataclass, field
+from typing import Any, Mapping, Tuple
 
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
 import streamlit as st
-from pde_calculations.sim_enums import InitialStateType, SimType
+from pde_calculations.sim_enums import InitialStateType, SimType, SolverType
 from web_application.param_enums import Params
 
 from pde_calculations.analysis_calcs import (
+    AggregationReport,
+    get_aggregation_report,
     get_energy_consumption_data,
     get_in_out_energy_cons,
     get_outer_power_cons,
 )
+from pde_calculations.ensemble import (
+    EnsembleResult,
+    fused_ensemble_simulation,
+    split_fused_result,
+)
 from pde_calculations.environment import Environment
-from pde_calculations.flow import Flow
+from pde_calculations.flow_table import FlowTable, get_first_changed_step
 from pde_calculations.heat_pde import HeatTransferEquation
 from pde_calculations.medium import Medium
-from pde_calculations.simulations import (
-    base_simulation,
-    cooler_simulation,
-    heater_simulation,
-)
+from pde_calculations.simulations import base_simulation, get_run_substep_counts
 from pde_calculations.vessel import Vessel
+from web_application.result_cache import get_input_hash, get_result_cache
 
 
-def df_to_np_temp_mass_array(
-    df: pd.DataFrame,
-) -> tuple[list[npt.NDArray[np.float64]], list[npt.NDArray[np.float64]]]:
-    col_number = len(list(df.columns))
-    temperatures: list[npt.NDArray[np.float64]] = [
-        df[f"Temperatur {i}"].to_numpy() for i in range(int(col_number / 2))  # type: ignore
-    ]
-    masses: list[npt.NDArray[np.float64]] = [
-        df[f"Volumenstrom {i}"].to_numpy() for i in range(int(col_number / 2))  # type: ignore
-    ]
-    return temperatures, masses
-
-
-def get_medium() -> Medium:
+def get_medium(params: Mapping[str, Any] = st.session_state) -> Medium:
     return Medium(
-        density=st.session_state[Params.DENSITY.value],
-        alpha=st.session_state[Params.DIFFUSIVITY.value] * 10 ** (-7),
-        c_p=st.session_state[Params.C_P.value],
+        density=params[Params.DENSITY.value],
+        alpha=params[Params.DIFFUSIVITY.value] * 10 ** (-7),
+        c_p=params[Params.C_P.value],
     )
 
 
-def get_vessel() -> Vessel:
+def get_vessel(params: Mapping[str, Any] = st.session_state) -> Vessel:
     return Vessel(
-        height=st.session_state[Params.HEIGHT.value],
-        radius=st.session_state[Params.RADIUS.value],
-        segmentation=st.session_state[Params.NUM_SEGS.value],
-        initial_state=st.session_state[Params.INIT_STATE.value],
+        height=params[Params.HEIGHT.value],
+        radius=params[Params.RADIUS.value],
+        segmentation=params[Params.NUM_SEGS.value],
+        initial_state=params[Params.INIT_STATE.value],
+        theta=params[Params.THETA.value],
     )
 
 
-def get_environment() -> Environment:
-    return Environment(env_temp=st.session_state[Params.T_ENV.value])
+def get_environment(params: Mapping[str, Any] = st.session_state) -> Environment:
+    return Environment(env_temp=params[Params.T_ENV.value])
+
+
+def get_solver(params: Mapping[str, Any] = st.session_state) -> SolverType:
+    return SolverType(params[Params.SOLVER.value])
 
 
-def get_flows(medium: Medium) -> list[Flow]:
-    flows: list[Flow] = []
+def get_flows(medium: Medium) -> FlowTable:
+    tables: list[FlowTable] = []
     if "edited_source" in st.session_state:
-        source_temps, source_masses = df_to_np_temp_mass_array(
-            st.session_state.edited_source
-        )
-        flows.extend(
-            [
-                Flow(
-                    flow_temp=source_temps[i],
-                    volume_flow=source_masses[i],
-                    input_type=SimType.SOURCE,
-                    medium=medium,
-                )
-                for i, _ in enumerate(source_temps)
-            ]
+        tables.append(
+            FlowTable.from_dataframe(
+                st.session_state.edited_source, SimType.SOURCE, medium
+            )
         )
     if "edited_sink" in st.session_state:
-        sink_temps, sink_masses = df_to_np_temp_mass_array(st.session_state.edited_sink)
-        flows.extend(
-            [
-                Flow(
-                    flow_temp=sink_temps[i],
-                    volume_flow=sink_masses[i],
-                    input_type=SimType.SINK,
-                    medium=medium,
-                )
-                for i, _ in enumerate(sink_temps)
-            ]
+        tables.append(
+            FlowTable.from_dataframe(st.session_state.edited_sink, SimType.SINK, medium)
         )
+    return FlowTable.concat(tables)
+
+
+def get_simulation_flows(flows: FlowTable) -> FlowTable:
+    """
+    Flows the simulations run on, merged into one flow per side if selected.
+    """
+
+    if st.session_state.get(Params.AGGREGATE_FLOWS.value, False):
+        return flows.aggregated()
     return flows
 
 
-def get_base_simulation_results() -> npt.NDArray[np.float64]:
-    medium = get_medium()
-    flows = get_flows(medium=medium)
-    vessel = get_vessel()
-    env = get_environment()
-    pde = HeatTransferEquation(fluid=medium, vessel=vessel, env=env)
-    return base_simulation(
-        hte=pde, flows=flows, delta_t=st.session_state[Params.DELTA_T.value]
-    )
+@dataclass
+class SimulationContext:
+    """
+    Inputs of one simulation run, built once per rerun from the session state (see
+    get_simulation_context) and handed to every backend function, so the edited
+    DataFrames are only converted to arrays once.
+    """
 
+    parameters: dict[str, Any]  # value of every Params entry
+    medium: Medium
+    vessel: Vessel
+    env: Environment
+    flows: FlowTable  # uploaded and edited flows
+    simulation_flows: FlowTable  # see get_simulation_flows
+    delta_t: int
+    solver: SolverType
+    hte: HeatTransferEquation = field(init=False)
 
-def get_heater_simulation_results() -> (
-    Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]
-):
+    def __post_init__(self):
+        self.hte = HeatTransferEquation(
+            fluid=self.medium, vessel=self.vessel, env=self.env
+        )
+
+
+def get_simulation_context() -> SimulationContext:
     medium = get_medium()
     flows = get_flows(medium=medium)
-    vessel = get_vessel()
-    env = get_environment()
-    pde = HeatTransferEquation(fluid=medium, vessel=vessel, env=env)
-    heater_result, heater_power = heater_simulation(
-        hte=pde,
+    return SimulationContext(
+        parameters={param.value: st.session_state[param.value] for param in Params},
+        medium=medium,
+        vessel=get_vessel(),
+        env=get_environment(),
         flows=flows,
+        simulation_flows=get_simulation_flows(flows),
         delta_t=st.session_state[Params.DELTA_T.value],
-        vessel_section=st.session_state[Params.HEAT_PERC.value],
-        critical_temp=st.session_state[Params.HEAT_CRIT_T.value],
-        turn_off_temp=st.session_state[Params.HEAT_GOAL_T.value],
-        heating_temp=st.session_state[Params.HEAT_T.value],
+        solver=get_solver(),
     )
-    return heater_result, heater_power
 
 
-def get_cooler_simulation_results(
-    sim_result: npt.NDArray[np.float64],
-) -> npt.NDArray[np.float64]:
-    medium = get_medium()
-    flows = get_flows(medium=medium)
-    return cooler_simulation(
-        layer=sim_result[-2, 1:],
-        desired_temp=st.session_state[Params.COOLER_GOAL_T.value],
-        flows=flows,
-        c_p_fluid=st.session_state[Params.C_P.value],
+def get_result_key(
+    name: str,
+    context: SimulationContext,
+    flows: FlowTable,
+    arrays: tuple[npt.NDArray, ...] = (),
+) -> str:
+    """
+    Key of a result in the result cache: hash of the flows, further input arrays and
+    every parameter of the run.
+    """
+
+    return get_input_hash(
+        name,
+        (flows.flow_temps, flows.volume_flows, flows.is_source, *arrays),
+        context.parameters,
     )
 
 
+def get_fused_simulation_results(
+    context: SimulationContext,
+) -> Tuple[
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+    npt.NDArray[np.float64],
+]:
+    """
+    Base, heater and cooler simulation in one pass, see
+    pde_calculations.ensemble.fused_ensemble_simulation and split_fused_result.
+
+    Results are taken from the result cache if the same inputs were simulated before.
+    Otherwise the last run of the session is used: if only the flows changed since then
+    (e.g. a factor in the raw data section or appended data), the run resumes from the
+    first changed time step instead of starting over.
+    """
+
+    flows = context.simulation_flows
+    result_key = get_result_key("fused", context, flows)
+    cached = get_result_cache().get(result_key)
+    if cached is not None:
+        result = EnsembleResult(*cached)
+    else:
+        result = run_fused_simulation(context)
+        get_result_cache().put(
+            result_key,
+            (
+                result.vessel_state,
+                result.heater_power,
+                result.cooler_power,
+                result.heater_on,
+            ),
+        )
+    # the edited data frames are changed in place, keep a copy of the simulated flows
+    st.session_state.previous_fused_run = (
+        context.parameters,
+        FlowTable(
+            flow_temps=np.array(flows.flow_temps),
+            volume_flows=np.array(flows.volume_flows),
+            is_source=flows.is_source,
+            medium=flows.medium,
+        ),
+        result,
+    )
+    return split_fused_result(result)
+
+
+def run_fused_simulation(context: SimulationContext) -> EnsembleResult:
+    """
+    Fused simulation of the flows, resumed from the last run of the session if only
+    the flows changed since then.
+    """
+
+    resume_from: EnsembleResult | None = None
+    resume_timestep = 0
+    previous_run: tuple[dict, FlowTable, EnsembleResult] | None = st.session_state.get(
+        "previous_fused_run"
+    )
+    if previous_run is not None and previous_run[0] == context.parameters:
+        _, previous_flows, resume_from = previous_run
+        resume_timestep = get_first_changed_step(
+            previous_flows, context.simulation_flows
+        )
+    return fused_ensemble_simulation(
+        hte=context.hte,
+        flows=context.simulation_flows,
+        delta_t=context.delta_t,
+        vessel_section=context.parameters[Params.HEAT_PERC.value],
+        critical_temp=context.parameters[Params.HEAT_CRIT_T.value],
+        turn_off_temp=context.parameters[Params.HEAT_GOAL_T.value],
+        heating_temp=context.parameters[Params.HEAT_T.value],
+        cooler_temp=context.parameters[Params.COOLER_GOAL_T.value],
+        solver=context.solver,
+        resume_from=resume_from,
+        resume_timestep=resume_timestep,
+    )
+
+
+def get_substep_counts(context: SimulationContext) -> npt.NDArray[np.int64]:
+    return get_run_substep_counts(
+        coefficients=context.hte.get_coefficient_plan(),
+        flows=context.simulation_flows,
+        delta_t=context.delta_t,
+        solver=context.solver,
+        sub_stepping=True,
+    )
+
+
+def get_aggregation_deviation(
+    context: SimulationContext,
+    aggregated_result: npt.NDArray[np.float64],
+) -> AggregationReport:
+    """
+    Deviation of the base simulation on the aggregated flows from the simulation on
+    the separate flows, which is run for the comparison.
+    """
+
+    # cached, the results are shown again on every rerun (e.g. of the plot range)
+    (reference_result,) = get_result_cache().get_or_compute(
+        get_result_key("aggregation_reference", context, context.flows),
+        lambda: (
+            base_simulation(
+                hte=context.hte,
+                flows=context.flows,
+                delta_t=context.delta_t,
+                solver=context.solver,
+            ),
+        ),
+    )
+    return get_aggregation_report(reference_result, aggregated_result)
+
+
 def get_analysis_results(
+    context: SimulationContext,
     base_result: npt.NDArray[np.float64],
     heater_power: npt.NDArray[np.float64],
     cooler_power: npt.NDArray[np.float64],
 ) -> tuple[float, float, npt.NDArray[np.float64], npt.NDArray[np.float64]]:
-    medium = get_medium()
-    flows = get_flows(medium=medium)
-    _, total_energy = get_energy_consumption_data(
-        heater_power, delta_t=st.session_state[Params.DELTA_T.value]
-    )
+    _, total_energy = get_energy_consumption_data(heater_power, delta_t=context.delta_t)
     _, cooler_energy_total = get_energy_consumption_data(
-        cooler_power, delta_t=st.session_state[Params.DELTA_T.value]
+        cooler_power, delta_t=context.delta_t
     )
     source_energy, sink_energy = get_in_out_energy_cons(
-        flows=flows, vessel_state=base_result
+        flows=context.flows,
+        vessel_state=base_result,
+        delta_t=context.delta_t,
     )
     return (total_energy, cooler_energy_total, source_energy, sink_energy)
 
 
-def get_source_sink_power_consumption(simulation_result: npt.NDArray[np.float64]):
-    medium = get_medium()
-    flows = get_flows(medium=medium)
+def get_source_sink_power_consumption(
+    context: SimulationContext, simulation_result: npt.NDArray[np.float64]
+):
     source_power, sink_power = get_outer_power_cons(
-        flows=flows, medium=medium, simulation_result=simulation_result
+        flows=context.flows,
+        medium=context.medium,
+        simulation_result=simulation_result,
     )
     return source_power, sink_power
 
@@ -177,6 +292,9 @@ def get_init_state_idx(init_state: str) -> int:
 
 def set_parameter_data(param_dict: dict[str, list[str | int | float]]) -> None:
     for param in Params:
+        if param.value not in param_dict:
+            # set was saved before this parameter existed, keep the current value
+            continue
         if param.value == Params.INIT_STATE.value:
             st.session_state.init_state_idx = get_init_state_idx(
                 str(param_dict[param.value][0])
@@ -23,6 +23,9 @@ DTYPEMAP = {
     Params.HEAT_GOAL_T.value: "float",
     Params.HEAT_T.value: "float",
     Params.COOLER_GOAL_T.value: "float",
+    Params.SOLVER.value: "str",
+    Params.THETA.value: "float",
+    Params.AGGREGATE_FLOWS.value: "bool",
 }
 
 
@@ -39,7 +42,8 @@ class ParamDataBase:
             usecols=list(range(len(Params) + 1)),
             ttl=0,
         ).dropna(how="all")
-        df = df.astype(DTYPEMAP)
+        # sets saved before a parameter was introduced lack its column
+        df = df.astype({key: dtype for key, dtype in DTYPEMAP.items() if key in df})
         return df
 
     def update_database(self) -> None:
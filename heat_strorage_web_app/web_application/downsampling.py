@@ -0,0 +1,138 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import numpy.typing as npt
+
+PLOT_POINT_BUDGET = 4000  # points per trace sent to the browser
+
+
+@dataclass
+class MinMaxLevel:
+    """
+    Minimum and maximum of every bucket of 2**level time steps of each series, together
+    with the time steps at which they occur.
+    """
+
+    min_index: npt.NDArray[np.int64]  # (series, buckets)
+    min_value: npt.NDArray[np.float64]  # (series, buckets)
+    max_index: npt.NDArray[np.int64]  # (series, buckets)
+    max_value: npt.NDArray[np.float64]  # (series, buckets)
+
+
+def split_pairs(array: npt.NDArray) -> tuple[npt.NDArray, npt.NDArray]:
+    """
+    First and second bucket of every pair of neighbouring buckets (columns), an odd
+    last bucket is paired with itself.
+    """
+
+    if array.shape[1] % 2:
+        array = np.concatenate([array, array[:, -1:]], axis=1)
+    return array[:, 0::2], array[:, 1::2]
+
+
+def combine_bucket_pairs(level: MinMaxLevel) -> MinMaxLevel:
+    """
+    Next coarser level, every two neighbouring buckets are merged into one.
+    """
+
+    min_first, min_second = split_pairs(level.min_value)
+    min_first_index, min_second_index = split_pairs(level.min_index)
+    max_first, max_second = split_pairs(level.max_value)
+    max_first_index, max_second_index = split_pairs(level.max_index)
+    take_second_min = min_second < min_first
+    take_second_max = max_second > max_first
+    return MinMaxLevel(
+        min_index=np.where(take_second_min, min_second_index, min_first_index),
+        min_value=np.where(take_second_min, min_second, min_first),
+        max_index=np.where(take_second_max, max_second_index, max_first_index),
+        max_value=np.where(take_second_max, max_second, max_first),
+    )
+
+
+@dataclass
+class MinMaxPyramid:
+    """
+    Min/max pyramid of one or several series of equal length (rows of values). Level k
+    keeps the minimum and maximum of every bucket of 2**k time steps, so any time range
+    can be drawn with a bounded number of points while peaks of the full resolution
+    stay visible. The levels are built once per result in O(number of time steps).
+    """
+
+    values: npt.NDArray[np.float64]  # (series, steps)
+    levels: list[MinMaxLevel] = field(init=False)  # level 0 is the full resolution
+
+    def __post_init__(self):
+        self.values = np.atleast_2d(self.values)
+        indices = np.broadcast_to(np.arange(self.number_of_steps), self.values.shape)
+        self.levels = [
+            MinMaxLevel(
+                min_index=indices,
+                min_value=self.values,
+                max_index=indices,
+                max_value=self.values,
+            )
+        ]
+        while self.levels[-1].min_value.shape[1] > 1:
+            self.levels.append(combine_bucket_pairs(self.levels[-1]))
+
+    @property
+    def number_of_steps(self) -> int:
+        return self.values.shape[1]
+
+    def get_level(self, start: int, stop: int, point_budget: int) -> int:
+        """
+        Finest level which draws the time steps start to stop (exclusive) with at most
+        point_budget points per series.
+        """
+
+        length = max(stop - start, 1)
+        if length <= point_budget:
+            return 0
+        level = 1
+        while (
+            2 * -(-length // 2**level) > point_budget and level < len(self.levels) - 1
+        ):
+            level += 1
+        return level
+
+    def get_points(
+        self, start: int, stop: int, point_budget: int = PLOT_POINT_BUDGET
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """
+        Time steps and values of every series to draw the range start to stop
+        (exclusive), both of the shape (series, points). Below the point budget every
+        time step is returned, otherwise the minimum and maximum of each bucket of the
+        chosen level in the order they occur.
+        """
+
+        start = min(max(start, 0), self.number_of_steps)
+        stop = min(max(stop, start), self.number_of_steps)
+        level = self.get_level(start, stop, point_budget)
+        if level == 0:
+            indices = np.arange(start, stop)
+            return (
+                np.broadcast_to(indices, (self.values.shape[0], len(indices))),
+                self.values[:, start:stop],
+            )
+        buckets = slice(start >> level, -(-stop // 2**level))
+        pyramid_level = self.levels[level]
+        min_index = pyramid_level.min_index[:, buckets]
+        max_index = pyramid_level.max_index[:, buckets]
+        min_first = min_index <= max_index
+        first_index = np.where(min_first, min_index, max_index)
+        second_index = np.where(min_first, max_index, min_index)
+        first_value = np.where(
+            min_first,
+            pyramid_level.min_value[:, buckets],
+            pyramid_level.max_value[:, buckets],
+        )
+        second_value = np.where(
+            min_first,
+            pyramid_level.max_value[:, buckets],
+            pyramid_level.min_value[:, buckets],
+        )
+        shape = (self.values.shape[0], -1)
+        return (
+            np.stack([first_index, second_index], axis=-1).reshape(shape),
+            np.stack([first_value, second_value], axis=-1).reshape(shape),
+        )
@@ -19,6 +19,9 @@ class Params(Enum):
     HEAT_GOAL_T = "heat_goal_t"
     HEAT_T = "heat_t"
     COOLER_GOAL_T = "cooler_goal_t"
+    SOLVER = "solver"
+    THETA = "theta"
+    AGGREGATE_FLOWS = "aggregate_flows"
 
 class ParamDefaultChoices(Enum):
     DEFAULT_DASH = '-'
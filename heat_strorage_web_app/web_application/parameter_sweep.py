@@ -0,0 +1,201 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from web_application.param_enums import Params
+
+from pde_calculations.flow_table import FlowTable
+from pde_calculations.heat_pde import HeatTransferEquation
+from pde_calculations.sim_enums import StorageMode
+from pde_calculations.simulations import HeaterSettings
+from pde_calculations.storage import StoragePolicy, stored_simulation
+from web_application.backend_connection import (
+    get_environment,
+    get_medium,
+    get_solver,
+    get_vessel,
+)
+
+RESULT_COLUMNS = [
+    "heater_energy_kwh",
+    "cooler_energy_kwh",
+    "source_energy_kwh",
+    "sink_energy_kwh",
+]
+
+# flow data of the sweep, attached once per worker process (see attach_shared_flows)
+WORKER_FLOW_DATA: dict[str, Any] = {}
+
+
+def expand_parameter_grid(
+    base_params: Mapping[str, Any], ranges: Mapping[Params, Sequence[Any]]
+) -> list[dict[str, Any]]:
+    """
+    Expands the given parameter ranges into the full grid of scenarios. Every scenario
+    is a complete parameter set, parameters without a range keep their base value.
+
+    Parameters
+    ----------
+    base_params: Mapping[str, Any]
+        Value of every Params entry (keyed by its value), e.g. the session state.
+    ranges: Mapping[Params, Sequence[Any]]
+        Values to sweep for each varied parameter.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One parameter set per combination of the swept values.
+    """
+
+    base = {param.value: base_params[param.value] for param in Params}
+    swept_params = list(ranges)
+    scenarios: list[dict[str, Any]] = []
+    for values in itertools.product(*(ranges[param] for param in swept_params)):
+        scenario = dict(base)
+        scenario.update(
+            {param.value: value for param, value in zip(swept_params, values)}
+        )
+        scenarios.append(scenario)
+    return scenarios
+
+
+def attach_shared_flows(
+    shared_memory_name: str,
+    shape: tuple[int, int, int],
+    is_source: npt.NDArray[np.bool_],
+) -> None:
+    """
+    Worker initializer, maps the flow arrays of the sweep from shared memory instead of
+    receiving a pickled copy with every scenario.
+    """
+
+    shared_memory = SharedMemory(name=shared_memory_name)
+    WORKER_FLOW_DATA["shared_memory"] = shared_memory
+    WORKER_FLOW_DATA["arrays"] = np.ndarray(
+        shape, dtype=np.float64, buffer=shared_memory.buf
+    )
+    WORKER_FLOW_DATA["is_source"] = is_source
+
+
+def run_scenario(params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Runs the base, heater and cooler simulation of one scenario on the shared flows and
+    returns the energy totals of the scenario.
+    """
+
+    flow_temps, volume_flows = WORKER_FLOW_DATA["arrays"]
+    medium = get_medium(params)
+    delta_t = params[Params.DELTA_T.value]
+
+    def build_pde() -> HeatTransferEquation:
+        return HeatTransferEquation(
+            fluid=medium, vessel=get_vessel(params), env=get_environment(params)
+        )
+
+    # the simulations do not modify their flows, all runs share the mapped arrays
+    flows = FlowTable(
+        flow_temps=flow_temps,
+        volume_flows=volume_flows,
+        is_source=WORKER_FLOW_DATA["is_source"],
+        medium=medium,
+    )
+    if params.get(Params.AGGREGATE_FLOWS.value, False):
+        flows = flows.aggregated()
+    # only the energy totals are needed, no vessel state is kept
+    policy = StoragePolicy(mode=StorageMode.TOTALS)
+    base_result = stored_simulation(
+        hte=build_pde(),
+        flows=flows,
+        delta_t=delta_t,
+        policy=policy,
+        solver=get_solver(params),
+    )
+    heater_result = stored_simulation(
+        hte=build_pde(),
+        flows=flows,
+        delta_t=delta_t,
+        policy=policy,
+        heater=HeaterSettings(
+            vessel_section=params[Params.HEAT_PERC.value],
+            critical_temp=params[Params.HEAT_CRIT_T.value],
+            turn_off_temp=params[Params.HEAT_GOAL_T.value],
+            heating_temp=params[Params.HEAT_T.value],
+        ),
+        cooler_temp=params[Params.COOLER_GOAL_T.value],
+        solver=get_solver(params),
+    )
+    return dict(
+        zip(
+            RESULT_COLUMNS,
+            [
+                heater_result.heater_energy,
+                heater_result.cooler_energy,
+                base_result.source_energy,
+                base_result.sink_energy,
+            ],
+        )
+    )
+
+
+def run_parameter_sweep(
+    flows: FlowTable,
+    base_params: Mapping[str, Any],
+    ranges: Mapping[Params, Sequence[Any]],
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Runs every scenario of the parameter grid in a process pool. The flow temperatures
+    and volume flows are placed in shared memory once, the workers map them instead of
+    receiving them with each scenario.
+
+    Parameters
+    ----------
+    flows: FlowTable
+        Input flows shared by all scenarios. Their mass flows are derived from the
+        density of each scenario.
+    base_params: Mapping[str, Any]
+        Value of every Params entry (keyed by its value), e.g. the session state.
+    ranges: Mapping[Params, Sequence[Any]]
+        Values to sweep for each varied parameter, e.g. {Params.HEIGHT: [6, 8, 10]}.
+    max_workers: int | None
+        Number of worker processes, defaults to the number of processors.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per scenario with the swept parameters and the heater, cooler, source
+        and sink energy in kWh.
+    """
+
+    scenarios = expand_parameter_grid(base_params, ranges)
+    flow_data = np.array([flows.flow_temps, flows.volume_flows], dtype=np.float64)
+    shared_memory = SharedMemory(create=True, size=flow_data.nbytes)
+    try:
+        shared_flow_data = np.ndarray(
+            flow_data.shape, dtype=np.float64, buffer=shared_memory.buf
+        )
+        shared_flow_data[:] = flow_data
+        del shared_flow_data  # the shared memory can only be closed without views
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=attach_shared_flows,
+            initargs=(
+                shared_memory.name,
+                flow_data.shape,
+                flows.is_source,
+            ),
+        ) as executor:
+            results = list(executor.map(run_scenario, scenarios))
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+    return pd.DataFrame(
+        [
+            {param.value: scenario[param.value] for param in ranges} | result
+            for scenario, result in zip(scenarios, results)
+        ]
+    )
@@ -1,11 +1,18 @@
 import re
+from pathlib import Path
 
 import numpy as np
+import numpy.typing as npt
 import pandas as pd
 import streamlit as st
+from pde_calculations.data_loader import read_flow_data
 from streamlit.runtime.uploaded_file_manager import UploadedFile
+from web_application.result_cache import ResultCache, get_input_hash
 from web_application.st_plot import plotly_raw_data
 
+UPLOAD_CACHE_ENTRIES = 16  # parsed uploads kept in memory
+UPLOAD_CACHE_MEMORY_BYTES = 256 * 1024**2  # size cap of the parsed uploads
+
 
 def display_raw_data_section():
     st.subheader("Rohdaten")
@@ -168,15 +175,42 @@ def get_dfs(
     return source_df, sink_df
 
 
+@st.cache_resource
+def get_upload_cache() -> ResultCache:
+    """
+    Parsed uploads of the server keyed by the hash of the file content, shared by all
+    sessions.
+    """
+
+    return ResultCache(
+        max_entries=UPLOAD_CACHE_ENTRIES, max_memory_bytes=UPLOAD_CACHE_MEMORY_BYTES
+    )
+
+
+def parse_upload(raw_data: UploadedFile) -> npt.NDArray[np.float64]:
+    """
+    Data of the uploaded file, one column per flow temperature or volume flow (see
+    data_loader.read_flow_data). Reading an Excel file takes seconds for a year of data,
+    so every file content is only parsed once and then taken from the upload cache on
+    every rerun.
+    """
+
+    content = np.frombuffer(raw_data.getvalue(), dtype=np.uint8)
+    extension = Path(raw_data.name).suffix.lower()
+    (data,) = get_upload_cache().get_or_compute(
+        get_input_hash("upload", (content,), {"extension": extension}),
+        lambda: (read_flow_data(raw_data, raw_data.name),),
+    )
+    return data
+
+
 def raw_to_df(raw_data: UploadedFile) -> pd.DataFrame:
-    df = pd.read_excel(raw_data, skiprows=1, header=None, dtype=np.float64)  # type: ignore
-    header = [f"Temperatur {i}" for i in range(int(len(df.columns) / 2))]
-    header.extend([f"Volumenstrom {i}" for i in range(int(len(df.columns) / 2))])
-    rename_dict = {  # type: ignore
-        list(df.columns)[i]: new_header for (i, new_header) in enumerate(header)
-    }
-    df.rename(columns=rename_dict, inplace=True)  # type: ignore
-    return df
+    data = parse_upload(raw_data)
+    header: list[str | int] = [f"Temperatur {i}" for i in range(int(data.shape[1] / 2))]
+    header.extend([f"Volumenstrom {i}" for i in range(int(data.shape[1] / 2))])
+    header.extend(range(len(header), data.shape[1]))  # unpaired last column
+    # the cached data is read-only and shared, the DataFrame gets its own copy
+    return pd.DataFrame(data, columns=header, copy=True)
 
 
 def manipulate_source(header: str, original_df: pd.DataFrame) -> None:
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Mapping, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import streamlit as st
+
+import pde_calculations
+from pde_calculations.flow_table import read_only_view
+
+CachedArrays = tuple[npt.NDArray, ...]
+
+RESULT_CACHE_ENTRIES = 32  # results kept in memory
+RESULT_CACHE_MEMORY_BYTES = 1024**3  # size cap of the in-memory tier
+# directory of the optional disk tier, the disk tier is off without it
+RESULT_CACHE_DIR = os.environ.get("HEAT_STORAGE_RESULT_CACHE_DIR")
+RESULT_CACHE_DISK_BYTES = 512 * 1024**2  # size cap of the disk tier
+RESULT_CACHE_FORMAT = 1  # increase when the layout of the cached arrays changes
+
+
+def get_code_version() -> str:
+    """
+    Hash of the cache format and the source of the simulation code. It is part of every
+    key, so results computed by an earlier version of the solver (e.g. in the disk tier
+    of a previous deployment) are never served.
+    """
+
+    code_hash = hashlib.sha256(f"format {RESULT_CACHE_FORMAT}".encode())
+    for path in sorted(Path(pde_calculations.__file__).parent.glob("*.py")):
+        code_hash.update(path.name.encode())
+        code_hash.update(path.read_bytes())
+    return code_hash.hexdigest()
+
+
+CODE_VERSION = get_code_version()
+
+
+def get_input_hash(
+    name: str, arrays: Sequence[npt.NDArray], parameters: Mapping[str, Any]
+) -> str:
+    """
+    Content address of a result: hash of the code version (see get_code_version), the
+    computation's name, the content of its input arrays and every parameter value.
+    """
+
+    input_hash = hashlib.sha256(f"{CODE_VERSION};{name}".encode())
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        input_hash.update(f"{array.dtype}{array.shape}".encode())
+        input_hash.update(array.data)
+    for key in sorted(parameters):
+        input_hash.update(f"{key}={parameters[key]!r};".encode())
+    return input_hash.hexdigest()
+
+
+class ResultCache:
+    """
+    Results keyed by their input hash with a least recently used in-memory tier and an
+    optional disk tier, both capped in size. The cached arrays are read-only, since they are
+    shared by every caller with the same inputs.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_ENTRIES,
+        cache_dir: str | None = None,
+        max_disk_bytes: int = RESULT_CACHE_DISK_BYTES,
+        max_memory_bytes: int = RESULT_CACHE_MEMORY_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: OrderedDict[str, CachedArrays] = OrderedDict()
+        self.lock = threading.Lock()
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> CachedArrays | None:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        arrays = self.read_from_disk(key)
+        if arrays is not None:
+            self.put_in_memory(key, arrays)
+        return arrays
+
+    def put(self, key: str, arrays: Sequence[npt.NDArray]) -> CachedArrays:
+        cached = tuple(read_only_view(array) for array in arrays)
+        self.put_in_memory(key, cached)
+        self.write_to_disk(key, cached)
+        return cached
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], Sequence[npt.NDArray]]
+    ) -> CachedArrays:
+        cached = self.get(key)
+        if cached is None:
+            cached = self.put(key, compute())
+        return cached
+
+    def put_in_memory(self, key: str, arrays: CachedArrays) -> None:
+        with self.lock:
+            self.entries[key] = arrays
+            self.entries.move_to_end(key)
+            memory_bytes = sum(
+                array.nbytes for arrays in self.entries.values() for array in arrays
+            )
+            # the newest entry is kept even if it exceeds the size cap on its own
+            while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries
+                or memory_bytes > self.max_memory_bytes
+            ):
+                _, evicted = self.entries.popitem(last=False)
+                memory_bytes -= sum(array.nbytes for array in evicted)
+
+    def get_disk_path(self, key: str) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{key}.npz"
+
+    def read_from_disk(self, key: str) -> CachedArrays | None:
+        path = self.get_disk_path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                arrays = tuple(
+                    read_only_view(data[f"arr_{i}"]) for i in range(len(data.files))
+                )
+        except (OSError, ValueError):
+            # incomplete or corrupted file, e.g. written by an interrupted process
+            path.unlink(missing_ok=True)
+            return None
+        path.touch()  # the modification time orders the disk tier by last use
+        return arrays
+
+    def write_to_disk(self, key: str, arrays: CachedArrays) -> None:
+        path = self.get_disk_path(key)
+        if path is None:
+            return
+        # write to a temporary file first, readers never see a partially written file
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as temp_file:
+            np.savez(temp_file, *arrays)
+        Path(temp_file.name).replace(path)
+        self.evict_disk()
+
+    def evict_disk(self) -> None:
+        """
+        Deletes the least recently used files until the disk tier fits its size cap.
+        """
+
+        assert self.cache_dir is not None
+        files = sorted(
+            self.cache_dir.glob("*.npz"), key=lambda file: file.stat().st_mtime
+        )
+        total_bytes = sum(file.stat().st_size for file in files)
+        for file in files:
+            if total_bytes <= self.max_disk_bytes:
+                break
+            total_bytes -= file.stat().st_size
+            file.unlink(missing_ok=True)
+
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """
+    Result cache of the server, shared by all sessions.
+    """
+
+    return ResultCache(cache_dir=RESULT_CACHE_DIR)
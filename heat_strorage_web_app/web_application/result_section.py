@@ -3,42 +3,83 @@ import numpy.typing as npt
 import streamlit as st
 
 from web_application.backend_connection import (
+    SimulationContext,
+    get_aggregation_deviation,
     get_analysis_results,
     get_source_sink_power_consumption,
+    get_substep_counts,
 )
 from web_application.param_enums import Params
 from web_application.st_plot import (
+    TimeRange,
     plot_comparison,
     plot_sim_results,
 )
 
 
 def display_result_section(
+    context: SimulationContext,
     base_result: npt.NDArray[np.float64],
     heater_result: npt.NDArray[np.float64],
     heater_power: npt.NDArray[np.float64],
     cooler_power: npt.NDArray[np.float64],
 ):
     st.subheader("Simulationsergebnisse")
-    display_temp_results(base_result=base_result, heater_result=heater_result)
+    display_substep_info(context=context)
+    display_aggregation_info(context=context, base_result=base_result)
+    time_range = get_time_range(number_of_steps=base_result.shape[1])
+    display_temp_results(
+        base_result=base_result, heater_result=heater_result, time_range=time_range
+    )
     total_energy, cooler_energy, source_energy, sink_energy = get_analysis_results(
-        base_result=base_result, heater_power=heater_power, cooler_power=cooler_power
+        context=context,
+        base_result=base_result,
+        heater_power=heater_power,
+        cooler_power=cooler_power,
     )
     source_power, sink_power = get_source_sink_power_consumption(
-        simulation_result=heater_result
+        context=context, simulation_result=heater_result
     )
     display_comparison(
         heater_power=heater_power,
         cooler_power=cooler_power,
         source_power=source_power,
         sink_power=sink_power,
+        time_range=time_range,
     )
     display_analysis_section(
         total_energy=total_energy,
         cooler_energy=cooler_energy,
         source_energy=source_energy,
         sink_energy=sink_energy,
-        num_sim_days=st.session_state[Params.DAYS.value],
+        num_sim_days=context.parameters[Params.DAYS.value],
+    )
+
+
+def display_substep_info(context: SimulationContext) -> None:
+    substep_counts = get_substep_counts(context)
+    refined_steps = int(np.count_nonzero(substep_counts > 1))
+    if refined_steps:
+        st.info(
+            f"Zur Stabilität wurden {refined_steps} von {len(substep_counts)} "
+            f"Zeitschritten in insgesamt {int(substep_counts[substep_counts > 1].sum())} "
+            "Teilschritte unterteilt."
+        )
+
+
+def display_aggregation_info(
+    context: SimulationContext, base_result: npt.NDArray[np.float64]
+) -> None:
+    if not (
+        context.parameters[Params.AGGREGATE_FLOWS.value]
+        and st.session_state.get("aggregation_check", False)
+    ):
+        return
+    report = get_aggregation_deviation(context=context, aggregated_result=base_result)
+    st.info(
+        "Abweichung durch das Zusammenfassen der Zuflüsse (ohne Heizstab): maximal "
+        f"{report.max_temp_deviation:.2f} K, im Mittel {report.mean_temp_deviation:.2f}"
+        f" K, an der untersten Schicht maximal {report.max_outlet_temp_deviation:.2f} K."
     )
 
 
@@ -47,12 +88,17 @@ def display_comparison(
     cooler_power: npt.NDArray[np.float64],
     source_power: list[npt.NDArray[np.float64]],
     sink_power: list[npt.NDArray[np.float64]],
+    time_range: TimeRange,
 ):
     labels = [f"Quellenleistung {i}" for i, _ in enumerate(source_power)]
     labels.extend([f"Senkenleistung {i}" for i, _ in enumerate(sink_power)])
     source_power.extend(sink_power)
     comp_fig = plot_comparison(
-        source_power, labels, heater_power=heater_power, cooler_power=cooler_power
+        source_power,
+        labels,
+        heater_power=heater_power,
+        cooler_power=cooler_power,
+        time_range=time_range,
     )
     st.plotly_chart(comp_fig, use_container_width=True)  # type:ignore
 
@@ -84,15 +130,32 @@ def display_analysis_section(
         st.metric("Jahreshochrechnung  \nEnergieverbrauch Notkühler  \nin MWh", "%.2f" % (float(cooler_energy) * 365 / num_sim_days / 1000))  # type: ignore
 
 
+def get_time_range(number_of_steps: int) -> TimeRange:
+    """
+    Time range shown in the result plots. The plots draw it with a bounded number of
+    points per trace, so narrowing the range reveals the full resolution.
+    """
+
+    return st.slider(
+        "Zeitbereich in Zeitschritten",
+        min_value=0,
+        max_value=number_of_steps,
+        value=(0, number_of_steps),
+        key="plot_range",
+    )
+
+
 def display_temp_results(
-    base_result: npt.NDArray[np.float64], heater_result: npt.NDArray[np.float64]
+    base_result: npt.NDArray[np.float64],
+    heater_result: npt.NDArray[np.float64],
+    time_range: TimeRange,
 ):
-    tab_normal_sim, tab_heater_sim = st.tabs(
-        ["Simulation ohne Spitzenlastheizung", "Simulation mit Spitzenlastheizung"]
-    )
+    titles = ["Simulation ohne Spitzenlastheizung", "Simulation mit Spitzenlastheizung"]
+    tab_normal_sim, tab_heater_sim = st.tabs(titles)
+    # the titles keep the charts apart when both results agree within the time range
     with tab_normal_sim:
-        result_fig = plot_sim_results(base_result)
+        result_fig = plot_sim_results(base_result, time_range, title=titles[0])
         st.plotly_chart(result_fig, use_container_width=True)  # type: ignore
     with tab_heater_sim:
-        heater_result_fig = plot_sim_results(heater_result)
+        heater_result_fig = plot_sim_results(heater_result, time_range, title=titles[1])
         st.plotly_chart(heater_result_fig, use_container_width=True)  # type: ignore
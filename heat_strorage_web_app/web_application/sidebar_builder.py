@@ -4,9 +4,12 @@ from web_application.backend_connection import (
     set_parameter_data,
 )
 from web_application.data_base_handle import ParamDataBase
-from pde_calculations.sim_enums import InitialStateType
+from pde_calculations.data_loader import FLOW_DATA_READERS
+from pde_calculations.sim_enums import InitialStateType, SolverType
 from web_application.param_enums import ParamDefaultChoices, Params
 
+FLOW_DATA_TYPES = [extension.lstrip(".") for extension in FLOW_DATA_READERS]
+
 
 def build_sidebar():
     display_sidebar_head()
@@ -18,6 +21,7 @@ def build_sidebar():
     display_environment()
     display_heater()
     display_cooler_settings()
+    display_solver_settings()
     display_simulation()
 
 
@@ -82,13 +86,13 @@ def display_data_features():
 def get_raw_data():
     source_data_raw = st.sidebar.file_uploader(
         "Quellen laden",
-        type=["xlsx"],
+        type=FLOW_DATA_TYPES,
         help="Datensatz wählen",
         key="source_data_raw",
     )
     sink_data_raw = st.sidebar.file_uploader(
         "Senken laden",
-        type=["xlsx"],
+        type=FLOW_DATA_TYPES,
         help="Senken laden",
         key="sink_data_raw",
     )
@@ -232,5 +236,52 @@ def display_cooler_settings():
     )
 
 
+def display_solver_settings():
+    st.sidebar.header("Lösungsverfahren")
+    solver = st.sidebar.selectbox(
+        "Zeitschrittverfahren",
+        [solver.value for solver in SolverType],
+        help=(
+            "Das implizite Verfahren bleibt auch bei großen Zeitschritten und feiner "
+            "Segmentierung stabil. Pro Zeitschritt rechnet es etwa zwei- bis dreimal "
+            "so lange wie das explizite Verfahren, lohnt sich also erst, wenn dieses "
+            "die Zeitschritte unterteilen muss."
+        ),
+        key=Params.SOLVER.value,
+    )
+    st.sidebar.number_input(
+        "Theta",
+        min_value=0.5,
+        max_value=1.0,
+        value=st.session_state.get(Params.THETA.value, 1.0),
+        step=0.1,
+        help=(
+            "Gewichtung des impliziten Anteils: 1.0 entspricht dem "
+            "Euler-Rückwärts-Verfahren, 0.5 Crank-Nicolson. Werte unter 1.0 können bei "
+            "groben Zeitschritten unphysikalische Temperaturen außerhalb der Zulauf- "
+            "und Anfangstemperaturen liefern."
+        ),
+        disabled=solver == SolverType.EXPLICIT.value,
+        key=Params.THETA.value,
+    )
+    aggregate = st.sidebar.checkbox(
+        "Zuflüsse je Seite zusammenfassen",
+        value=st.session_state.get(Params.AGGREGATE_FLOWS.value, False),
+        help=(
+            "Alle Quellen und alle Senken werden zu je einem Mischstrom "
+            "zusammengefasst. Die Simulation rechnet dann unabhängig von der Anzahl der "
+            "Zuflüsse nur zwei Ströme pro Zeitschritt."
+        ),
+        key=Params.AGGREGATE_FLOWS.value,
+    )
+    st.sidebar.checkbox(
+        "Abweichung durch Zusammenfassen prüfen",
+        value=False,
+        help="Rechnet zum Vergleich zusätzlich die Simulation mit den einzelnen Zuflüssen.",
+        disabled=not aggregate,
+        key="aggregation_check",
+    )
+
+
 def display_simulation():
     st.sidebar.button("Simulieren", key="sim_button")
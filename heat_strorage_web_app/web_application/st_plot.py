@@ -5,6 +5,77 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 from plotly.subplots import make_subplots
+from web_application.downsampling import PLOT_POINT_BUDGET, MinMaxPyramid
+from web_application.result_cache import get_input_hash
+
+PYRAMID_CACHE_ENTRIES = 16  # pyramids of result series kept between reruns
+TimeRange = tuple[int, int]  # first and last (exclusive) time step to draw
+COMPARISON_SPACING = 0.05  # vertical spacing between the rows of the comparison plot
+
+
+@st.cache_resource(max_entries=PYRAMID_CACHE_ENTRIES)
+def get_cached_pyramid(key: str, _values: npt.NDArray[np.float64]) -> MinMaxPyramid:
+    """
+    Min/max pyramid of the series (rows of _values) cached under the key, see
+    get_pyramid.
+    """
+
+    return MinMaxPyramid(_values)
+
+
+def get_pyramid(values: npt.NDArray[np.float64]) -> MinMaxPyramid:
+    """
+    Min/max pyramid of the series (rows of values), built once per result. The cache
+    is keyed by the exact content hash of values, Streamlit only hashes a sample of
+    large arrays and would mistake an edited result for the previous one.
+    """
+
+    return get_cached_pyramid(get_input_hash("pyramid", (values,), {}), values)
+
+
+@st.cache_data
+def get_comparison_layout(rows: int) -> dict:
+    """
+    Layout of the comparison plot with rows subplots on a shared x-axis, built once per
+    number of rows instead of with make_subplots on every rerun. Every call gets its own
+    copy, so a figure changing its layout does not change the layout of other sessions.
+    """
+
+    return make_subplots(
+        rows=rows, cols=1, shared_xaxes=True, vertical_spacing=COMPARISON_SPACING
+    ).layout.to_plotly_json()
+
+
+def get_downsampled_traces(
+    values: npt.NDArray[np.float64],
+    names: list[str],
+    time_range: TimeRange | None,
+) -> list[go.Scattergl]:
+    """
+    WebGL traces of the series (rows of values) within the time range, each with at
+    most PLOT_POINT_BUDGET points (see MinMaxPyramid.get_points).
+
+    The arrays are handed to plotly as they are, which sends them to the browser as
+    typed arrays instead of JSON lists. At the full resolution all traces share the
+    time steps, given by x0 and dx instead of an x array.
+    """
+
+    if time_range is None:
+        time_range = (0, values.shape[1])
+    pyramid = get_pyramid(values)
+    timesteps, downsampled = pyramid.get_points(
+        *time_range, point_budget=PLOT_POINT_BUDGET
+    )
+    if pyramid.get_level(*time_range, point_budget=PLOT_POINT_BUDGET) == 0:
+        start = int(timesteps[0, 0]) if timesteps.size else 0
+        return [
+            go.Scattergl(x0=start, dx=1, y=y, name=name, mode="lines")
+            for y, name in zip(downsampled, names)
+        ]
+    return [
+        go.Scattergl(x=x, y=y, name=name, mode="lines")
+        for x, y, name in zip(timesteps, downsampled, names)
+    ]
 
 
 def plotly_raw_data(raw_data: pd.DataFrame):
@@ -30,19 +101,34 @@ def plotly_raw_data(raw_data: pd.DataFrame):
     return fig_temps, fig_volumes
 
 
-def plot_sim_results(results: npt.NDArray[np.float64]):
-    column_header = [f"Schicht {i}" for i in range(results.shape[0])]
-    df = pd.DataFrame(results.T, columns=column_header)
-    df.drop(columns=[df.columns[0], df.columns[-1]], inplace=True)
-    fig = px.line(df, labels=dict(index="Zeit in Zeitschritten", value="Temperatur"))
+def plot_sim_results(
+    results: npt.NDArray[np.float64],
+    time_range: TimeRange | None = None,
+    title: str | None = None,
+):
+    fig = go.Figure(
+        get_downsampled_traces(
+            results[1:-1],
+            [f"Schicht {i}" for i in range(1, results.shape[0] - 1)],
+            time_range,
+        )
+    )
+    fig.update_layout(
+        title_text=title, xaxis_title="Zeit in Zeitschritten", yaxis_title="Temperatur"
+    )
     return fig
 
 
-def plot_power(powers: list[npt.NDArray[np.float64]], name: list[str]):
-    power_df = pd.DataFrame(np.concatenate(powers, axis=1), columns=name)
-    fig = px.line(
-        power_df,
-        labels=dict(index="Zeit in Zeitschritten", value="Thermische Leistung in kW"),
+def plot_power(
+    powers: list[npt.NDArray[np.float64]],
+    name: list[str],
+    time_range: TimeRange | None = None,
+):
+    fig = go.Figure(
+        get_downsampled_traces(np.concatenate(powers, axis=1).T, name, time_range)
+    )
+    fig.update_layout(
+        xaxis_title="Zeit in Zeitschritten", yaxis_title="Thermische Leistung in kW"
     )
     return fig
 
@@ -76,40 +162,15 @@ def plot_comparison(
     outer_names: list[str],
     cooler_power: npt.NDArray[np.float64],
     heater_power: npt.NDArray[np.float64],
+    time_range: TimeRange | None = None,
 ):
-    fig = make_subplots(
-        rows=len(outer_powers) + 2, cols=1, shared_xaxes=True, vertical_spacing=0.05
-    )
-    i = 1
-    for power in outer_powers:
-        fig.add_trace(
-            go.Scatter(
-                x=list(range(len(power))),
-                y=power.flatten().tolist(),
-                name=outer_names[i - 1],
-            ),
-            row=i,
-            col=1,
-        )
-        i += 1
-    fig.add_trace(
-        go.Scatter(
-            x=list(range(len(cooler_power))),
-            y=cooler_power.flatten().tolist(),
-            name="Notkühlerleistung",
-        ),
-        row=len(outer_powers) + 1,
-        col=1,
+    traces = get_downsampled_traces(
+        np.concatenate([*outer_powers, cooler_power, heater_power], axis=1).T,
+        [*outer_names, "Notkühlerleistung", "Spitzlenlastheizung-Leistung"],
+        time_range,
     )
-    fig.add_trace(
-        go.Scatter(
-            x=list(range(len(heater_power))),
-            y=heater_power.flatten().tolist(),
-            name="Spitzlenlastheizung-Leistung",
-        ),
-        row=len(outer_powers) + 2,
-        col=1,
-    )
-
+    for row, trace in enumerate(traces, start=1):
+        trace.update(xaxis=f"x{row}", yaxis=f"y{row}")
+    fig = go.Figure(data=traces, layout=get_comparison_layout(len(traces)))
     fig.update_layout(title_text="Vergleichsgrafik")
     return fig
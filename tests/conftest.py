@@ -0,0 +1,75 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+APP_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "heat_strorage_web_app",
+)
+sys.path.append(APP_DIR)
+
+from pde_calculations.environment import Environment  # noqa: E402
+from pde_calculations.flow_table import FlowTable  # noqa: E402
+from pde_calculations.heat_pde import HeatTransferEquation  # noqa: E402
+from pde_calculations.medium import Medium  # noqa: E402
+from pde_calculations.vessel import Vessel  # noqa: E402
+
+NUMBER_OF_STEPS = 300
+DELTA_T = 300  # [s]
+
+
+def make_flows(
+    medium: Medium, number_of_steps: int = NUMBER_OF_STEPS, seed: int = 0
+) -> FlowTable:
+    """
+    Two source and two sink flows with random temperatures and volume flows.
+    """
+
+    rng = np.random.default_rng(seed)
+    flow_temps = np.vstack(
+        [
+            40 + 40 * rng.random((2, number_of_steps)),
+            10 + 30 * rng.random((2, number_of_steps)),
+        ]
+    )
+    volume_flows = 5 * rng.random((4, number_of_steps))
+    return FlowTable(
+        flow_temps=flow_temps,
+        volume_flows=volume_flows,
+        is_source=np.array([True, True, False, False]),
+        medium=medium,
+    )
+
+
+def make_hte(
+    medium: Medium,
+    height: float = 8,
+    radius: float = 2,
+    segmentation: int = 7,
+    theta: float = 1.0,
+    env_temp: float = 20,
+) -> HeatTransferEquation:
+    return HeatTransferEquation(
+        fluid=medium,
+        vessel=Vessel(
+            height=height, radius=radius, segmentation=segmentation, theta=theta
+        ),
+        env=Environment(env_temp=env_temp),
+    )
+
+
+@pytest.fixture
+def medium() -> Medium:
+    return Medium(density=1000, alpha=1.43e-7, c_p=4184)
+
+
+@pytest.fixture
+def flows(medium: Medium) -> FlowTable:
+    return make_flows(medium)
+
+
+@pytest.fixture
+def hte(medium: Medium) -> HeatTransferEquation:
+    return make_hte(medium)
@@ -0,0 +1,134 @@
+import numpy as np
+
+from pde_calculations.ensemble import (
+    fused_ensemble_simulation,
+    heater_ensemble_simulation,
+    split_fused_result,
+)
+from pde_calculations.flow_table import FlowTable, get_first_changed_step
+from pde_calculations.simulations import (
+    base_simulation,
+    cooler_simulation,
+    get_substep_counts,
+    heater_simulation,
+)
+from tests.conftest import DELTA_T, make_flows, make_hte
+
+# height, radius and critical temperature of every variant
+VARIANTS = [(8, 2, 60), (3, 0.8, 55), (10, 2.5, 65)]
+FUSED_ARGS = dict(
+    vessel_section=0.2,
+    critical_temp=60,
+    turn_off_temp=80,
+    heating_temp=85,
+    cooler_temp=20,
+)
+
+
+def test_ensemble_variants_match_single_runs(medium):
+    htes = [
+        make_hte(medium, height=height, radius=radius, segmentation=20)
+        for height, radius, _ in VARIANTS
+    ]
+    flows = make_flows(medium)
+    flows = FlowTable(
+        flow_temps=flows.flow_temps,
+        volume_flows=5 * flows.volume_flows,
+        is_source=flows.is_source,
+        medium=medium,
+    )
+    substep_counts = [
+        get_substep_counts(hte.get_coefficient_plan(), flows, DELTA_T).max()
+        for hte in htes
+    ]
+    # the variants need different numbers of sub steps
+    assert len(set(substep_counts)) > 1
+
+    result, heater_power = heater_ensemble_simulation(
+        htes,
+        flows,
+        DELTA_T,
+        vessel_section=0.2,
+        critical_temp=np.array([critical for _, _, critical in VARIANTS]),
+        turn_off_temp=80,
+        heating_temp=85,
+    )
+
+    for variant, (hte, (_, _, critical_temp)) in enumerate(zip(htes, VARIANTS)):
+        single_result, single_power = heater_simulation(
+            hte,
+            flows,
+            DELTA_T,
+            vessel_section=0.2,
+            critical_temp=critical_temp,
+            turn_off_temp=80,
+            heating_temp=85,
+        )
+        np.testing.assert_allclose(
+            result[1:-1, :, variant], single_result[1:-1], atol=1e-9
+        )
+        np.testing.assert_allclose(
+            heater_power[:, variant], single_power[:, 0], atol=1e-9
+        )
+
+
+def test_resumed_fused_run_matches_full_rerun(hte, medium, flows):
+    previous = fused_ensemble_simulation(hte, flows, DELTA_T, **FUSED_ARGS)
+    flow_temps = np.copy(flows.flow_temps)
+    flow_temps[:, 180:] += 5
+    edited = FlowTable(
+        flow_temps=flow_temps,
+        volume_flows=flows.volume_flows,
+        is_source=flows.is_source,
+        medium=medium,
+    )
+    first_changed_step = get_first_changed_step(flows, edited)
+    assert first_changed_step == 180
+
+    resumed = fused_ensemble_simulation(
+        hte,
+        edited,
+        DELTA_T,
+        **FUSED_ARGS,
+        resume_from=previous,
+        resume_timestep=first_changed_step,
+    )
+    full = fused_ensemble_simulation(hte, edited, DELTA_T, **FUSED_ARGS)
+
+    np.testing.assert_array_equal(resumed.vessel_state, full.vessel_state)
+    np.testing.assert_array_equal(resumed.heater_power, full.heater_power)
+    np.testing.assert_array_equal(resumed.cooler_power, full.cooler_power)
+    np.testing.assert_array_equal(resumed.heater_on, full.heater_on)
+
+
+def test_fused_run_matches_separate_runs(hte, flows):
+    base_result, heater_result, heater_power, cooler_power = split_fused_result(
+        fused_ensemble_simulation(hte, flows, DELTA_T, **FUSED_ARGS)
+    )
+
+    single_heater_result, single_heater_power = heater_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        vessel_section=FUSED_ARGS["vessel_section"],
+        critical_temp=FUSED_ARGS["critical_temp"],
+        turn_off_temp=FUSED_ARGS["turn_off_temp"],
+        heating_temp=FUSED_ARGS["heating_temp"],
+    )
+    np.testing.assert_allclose(
+        base_result[1:-1], base_simulation(hte, flows, DELTA_T)[1:-1], atol=1e-9
+    )
+    np.testing.assert_allclose(
+        heater_result[1:-1], single_heater_result[1:-1], atol=1e-9
+    )
+    np.testing.assert_allclose(heater_power, single_heater_power, atol=1e-9)
+    np.testing.assert_allclose(
+        cooler_power,
+        cooler_simulation(
+            single_heater_result[-2, 1:],
+            FUSED_ARGS["cooler_temp"],
+            flows,
+            flows.medium.c_p,
+        ),
+        atol=1e-9,
+    )
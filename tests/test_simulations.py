@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from pde_calculations.sim_enums import SimType, SolverType
+from pde_calculations.simulations import (
+    SimulationCheckpoint,
+    base_simulation,
+    calc_mix_power,
+    copy_extreme_temps,
+    get_next_vessel_state,
+    heater_simulation,
+)
+from tests.conftest import DELTA_T, make_hte
+
+HEATER_ARGS = dict(
+    vessel_section=0.2, critical_temp=60, turn_off_temp=80, heating_temp=85
+)
+
+
+def copy_extreme_temps_loop(current_vessel_state, next_vessel_state, state):
+    """
+    Layer by layer version of copy_extreme_temps for a single column.
+    """
+
+    if state == SimType.SOURCE:
+        j = 1
+        while (
+            current_vessel_state[j] >= current_vessel_state[0]
+            and j <= len(current_vessel_state) - 2
+        ):
+            next_vessel_state[j] = current_vessel_state[j]
+            j += 1
+    else:
+        j = len(current_vessel_state) - 1
+        while current_vessel_state[j] <= current_vessel_state[-1] and j >= 1:
+            next_vessel_state[j] = current_vessel_state[j]
+            j -= 1
+    return next_vessel_state
+
+
+@pytest.mark.parametrize("state", [SimType.SOURCE, SimType.SINK])
+def test_copy_extreme_temps_matches_layer_loop(state):
+    rng = np.random.default_rng(1)
+    # sorted columns have long runs of layers beyond the inflow temperature
+    current = np.hstack(
+        [rng.uniform(10, 80, (9, 20)), np.sort(rng.uniform(10, 80, (9, 20)), axis=0)]
+    )
+    next_state = rng.uniform(10, 80, current.shape)
+
+    result = copy_extreme_temps(current, np.copy(next_state), state)
+
+    for column in range(current.shape[1]):
+        expected = copy_extreme_temps_loop(
+            current[:, column], np.copy(next_state[:, column]), state
+        )
+        # the boundary rows hold the inflow, only the layers are kept
+        np.testing.assert_array_equal(result[1:-1, column], expected[1:-1])
+
+
+@pytest.mark.parametrize("state", [SimType.SOURCE, SimType.SINK])
+def test_vectorized_update_matches_layer_loop(hte, state):
+    rng = np.random.default_rng(2)
+    current = rng.uniform(10, 80, (hte.vessel.segmentation + 2, 1))
+    mass_flow = 1.2
+
+    expected = np.copy(current[:, 0])
+    for i in range(1, len(expected) - 1):
+        expected[i] = hte.get_next_layer_temp(
+            current_temp=current[i, 0],
+            above_temp=current[i - 1, 0],
+            below_temp=current[i + 1, 0],
+            mass_flow=mass_flow,
+            inflow_temp=current[i - 1 if state == SimType.SOURCE else i + 1, 0],
+            delta_t=DELTA_T,
+        )
+    expected = copy_extreme_temps_loop(current[:, 0], expected, state)
+
+    result = get_next_vessel_state(
+        current, mass_flow, state, hte.get_coefficient_plan(), DELTA_T
+    )
+    np.testing.assert_allclose(result[:, 0], expected, rtol=1e-12)
+
+
+def test_implicit_theta_zero_matches_explicit(medium, flows):
+    explicit = base_simulation(make_hte(medium), flows, DELTA_T, sub_stepping=False)
+    implicit = base_simulation(
+        make_hte(medium, theta=0.0), flows, DELTA_T, solver=SolverType.IMPLICIT
+    )
+    np.testing.assert_allclose(implicit[1:-1], explicit[1:-1], atol=1e-9)
+
+
+def test_implicit_backward_euler_stays_within_input_temps(medium, flows):
+    # coarse steps, the flow passes several layers per time step
+    hte = make_hte(medium, segmentation=50)
+    result = base_simulation(hte, flows, 3600, solver=SolverType.IMPLICIT)
+    layers = result[1:-1]
+    lower = min(flows.flow_temps.min(), hte.vessel.init_state[1:-1].min(), 20)
+    upper = max(flows.flow_temps.max(), hte.vessel.init_state[1:-1].max(), 20)
+    assert layers.min() >= lower - 1e-9
+    assert layers.max() <= upper + 1e-9
+
+
+def test_heater_power_sums_all_source_flows(hte, flows):
+    # the heater never switches off below 1000 °C
+    _, heater_power = heater_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        vessel_section=0.2,
+        critical_temp=1000,
+        turn_off_temp=1000,
+        heating_temp=85,
+    )
+    expected = sum(
+        calc_mix_power(
+            flows.mass_flows_kg_s[i], flows.medium.c_p, 85, flows.flow_temps[i]
+        )
+        for i in np.flatnonzero(flows.is_source)
+    )
+    np.testing.assert_allclose(heater_power[:, 0], expected, rtol=1e-12)
+    _, aggregated_power = heater_simulation(
+        hte,
+        flows.aggregated(),
+        DELTA_T,
+        vessel_section=0.2,
+        critical_temp=1000,
+        turn_off_temp=1000,
+        heating_temp=85,
+    )
+    np.testing.assert_allclose(aggregated_power, heater_power, rtol=1e-9)
+
+
+def test_resumed_heater_run_matches_full_run(hte, flows, tmp_path):
+    checkpoints = []
+    full_result, full_power = heater_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        **HEATER_ARGS,
+        checkpoint_interval=70,
+        on_checkpoint=checkpoints.append,
+    )
+    path = str(tmp_path / "checkpoint.npz")
+    checkpoints[1].save(path)
+    checkpoint = SimulationCheckpoint.load(path)
+
+    result, power = heater_simulation(
+        hte, flows, DELTA_T, **HEATER_ARGS, resume_from=checkpoint
+    )
+
+    np.testing.assert_array_equal(result, full_result[:, checkpoint.timestep :])
+    np.testing.assert_array_equal(power, full_power[checkpoint.timestep :])
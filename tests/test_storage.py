@@ -0,0 +1,225 @@
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from pde_calculations.analysis_calcs import get_in_out_energy_cons
+from pde_calculations.sim_enums import StorageMode
+from pde_calculations.simulations import (
+    DEFAULT_CHUNK_SIZE,
+    HeaterSettings,
+    cooler_simulation,
+    heater_simulation,
+    power_to_energy,
+)
+from pde_calculations.storage import StoragePolicy, stored_simulation
+from tests.conftest import DELTA_T, make_flows
+
+HEATER = HeaterSettings(
+    vessel_section=0.2, critical_temp=60, turn_off_temp=80, heating_temp=85
+)
+COOLER_TEMP = 20
+
+
+def run_heater_simulation(hte, flows):
+    return heater_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        vessel_section=HEATER.vessel_section,
+        critical_temp=HEATER.critical_temp,
+        turn_off_temp=HEATER.turn_off_temp,
+        heating_temp=HEATER.heating_temp,
+    )
+
+
+@pytest.mark.parametrize("mode", [StorageMode.FULL, StorageMode.DECIMATE])
+def test_stored_states_are_columns_of_full_result(hte, flows, mode):
+    stored = stored_simulation(
+        hte, flows, DELTA_T, StoragePolicy(mode, step=12), heater=HEATER
+    )
+    result, _ = run_heater_simulation(hte, flows)
+
+    np.testing.assert_array_equal(stored.vessel_state, result[:, stored.timesteps])
+
+
+def test_stored_windows_match_full_result(hte, flows):
+    step = 12
+    stored = stored_simulation(
+        hte, flows, DELTA_T, StoragePolicy(StorageMode.WINDOW, step), heater=HEATER
+    )
+    result, _ = run_heater_simulation(hte, flows)
+    # the window of k time steps holds the states after each of them
+    windows = result[:, 1:].reshape(result.shape[0], -1, step)
+
+    np.testing.assert_array_equal(
+        stored.timesteps, np.arange(step, flows.number_of_steps + 1, step)
+    )
+    np.testing.assert_allclose(stored.vessel_state, windows.mean(axis=2), rtol=1e-12)
+    np.testing.assert_array_equal(stored.min_state, windows.min(axis=2))
+    np.testing.assert_array_equal(stored.max_state, windows.max(axis=2))
+
+
+def test_accumulated_energies_match_post_hoc_analysis(hte, flows):
+    stored = stored_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        StoragePolicy(StorageMode.DECIMATE, step=12),
+        heater=HEATER,
+        cooler_temp=COOLER_TEMP,
+    )
+
+    result, heater_power = run_heater_simulation(hte, flows)
+    source_energy, sink_energy = get_in_out_energy_cons(flows, result, DELTA_T)
+    cooler_power = cooler_simulation(
+        result[-2, 1:], COOLER_TEMP, flows, flows.medium.c_p
+    )
+
+    np.testing.assert_allclose(
+        stored.heater_energy, power_to_energy(heater_power, DELTA_T).sum()
+    )
+    np.testing.assert_allclose(
+        stored.cooler_energy, power_to_energy(cooler_power, DELTA_T).sum()
+    )
+    np.testing.assert_allclose(stored.source_energy, source_energy.sum())
+    np.testing.assert_allclose(stored.sink_energy, sink_energy.sum())
+
+
+def test_resumed_run_keeps_accumulated_energies(hte, medium):
+    # long enough for several chunks, i.e. checkpoints
+    flows = make_flows(medium, number_of_steps=2500)
+    policy = StoragePolicy(StorageMode.WINDOW, step=12)
+    checkpoints = []
+    full = stored_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        policy,
+        heater=HEATER,
+        cooler_temp=COOLER_TEMP,
+        on_checkpoint=checkpoints.append,
+    )
+    assert len(checkpoints) > 1
+
+    resumed = stored_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        policy,
+        heater=HEATER,
+        cooler_temp=COOLER_TEMP,
+        resume_from=checkpoints[0],
+    )
+
+    for energy in ("heater_energy", "cooler_energy", "source_energy", "sink_energy"):
+        np.testing.assert_allclose(
+            getattr(resumed, energy), getattr(full, energy), rtol=1e-12
+        )
+    np.testing.assert_allclose(resumed.flow_energies, full.flow_energies, rtol=1e-12)
+    resumed_windows = full.timesteps > checkpoints[0].timestep
+    np.testing.assert_array_equal(
+        resumed.vessel_state, full.vessel_state[:, resumed_windows]
+    )
+
+
+def test_stored_run_resumes_from_heater_checkpoint(hte, medium):
+    flows = make_flows(medium, number_of_steps=2500)
+    checkpoints = []
+    heater_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        vessel_section=HEATER.vessel_section,
+        critical_temp=HEATER.critical_temp,
+        turn_off_temp=HEATER.turn_off_temp,
+        heating_temp=HEATER.heating_temp,
+        checkpoint_interval=1000,
+        on_checkpoint=checkpoints.append,
+    )
+    policy = StoragePolicy(StorageMode.DECIMATE, step=12)
+    full = stored_simulation(hte, flows, DELTA_T, policy, heater=HEATER)
+
+    resumed = stored_simulation(
+        hte, flows, DELTA_T, policy, heater=HEATER, resume_from=checkpoints[1]
+    )
+
+    for energy in ("heater_energy", "source_energy", "sink_energy"):
+        np.testing.assert_allclose(
+            getattr(resumed, energy), getattr(full, energy), rtol=1e-9
+        )
+    # the heater run accounts no cooler energies to continue from
+    with pytest.raises(ValueError):
+        stored_simulation(
+            hte,
+            flows,
+            DELTA_T,
+            policy,
+            heater=HEATER,
+            cooler_temp=COOLER_TEMP,
+            resume_from=checkpoints[1],
+        )
+
+
+def test_resume_keeps_energies_per_flow(hte, medium):
+    flows = make_flows(medium, number_of_steps=2500)
+    policy = StoragePolicy(StorageMode.DECIMATE, step=12)
+    checkpoints = []
+    full = stored_simulation(
+        hte, flows, DELTA_T, policy, heater=HEATER, on_checkpoint=checkpoints.append
+    )
+
+    resumed = stored_simulation(
+        hte, flows, DELTA_T, policy, heater=HEATER, resume_from=checkpoints[0]
+    )
+
+    np.testing.assert_allclose(resumed.flow_energies, full.flow_energies, rtol=1e-9)
+    # the totals alone cannot be split over the flows
+    with pytest.raises(ValueError):
+        stored_simulation(
+            hte,
+            flows,
+            DELTA_T,
+            policy,
+            heater=HEATER,
+            resume_from=replace(checkpoints[0], flow_energies=None),
+        )
+
+
+def test_decimated_run_keeps_default_chunks(hte, medium):
+    flows = make_flows(medium, number_of_steps=2500)
+    checkpoints = []
+    stored = stored_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        StoragePolicy(StorageMode.DECIMATE, step=flows.number_of_steps),
+        on_checkpoint=checkpoints.append,
+    )
+
+    # a step beyond the chunk size does not turn the horizon into one chunk
+    assert [checkpoint.timestep for checkpoint in checkpoints] == [
+        DEFAULT_CHUNK_SIZE,
+        2 * DEFAULT_CHUNK_SIZE,
+        flows.number_of_steps,
+    ]
+    np.testing.assert_array_equal(stored.timesteps, [0, flows.number_of_steps])
+
+
+def test_totals_keep_no_states(hte, flows):
+    stored = stored_simulation(
+        hte,
+        flows,
+        DELTA_T,
+        StoragePolicy(StorageMode.TOTALS),
+        heater=HEATER,
+        cooler_temp=COOLER_TEMP,
+    )
+    full = stored_simulation(
+        hte, flows, DELTA_T, StoragePolicy(), heater=HEATER, cooler_temp=COOLER_TEMP
+    )
+
+    assert stored.vessel_state.shape == (hte.vessel.segmentation + 2, 0)
+    assert stored.timesteps.size == 0
+    for energy in ("heater_energy", "cooler_energy", "source_energy", "sink_energy"):
+        assert getattr(stored, energy) == getattr(full, energy)
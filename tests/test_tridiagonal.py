@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from pde_calculations.tridiagonal import SCALAR_SWEEP_LIMIT, solve_tridiagonal
+
+
+@pytest.mark.parametrize("number_of_systems", [1, SCALAR_SWEEP_LIMIT + 1])
+def test_solve_tridiagonal_matches_dense_solve(number_of_systems):
+    rng = np.random.default_rng(3)
+    shape = (20, number_of_systems)
+    lower, upper, rhs = (rng.uniform(-1, 1, shape) for _ in range(3))
+    diagonal = 3 + rng.random(shape)
+
+    solution = solve_tridiagonal(lower, diagonal, upper, rhs)
+
+    for system in range(number_of_systems):
+        matrix = (
+            np.diag(diagonal[:, system])
+            + np.diag(lower[1:, system], -1)
+            + np.diag(upper[:-1, system], 1)
+        )
+        np.testing.assert_allclose(
+            solution[:, system], np.linalg.solve(matrix, rhs[:, system]), rtol=1e-12
+        )